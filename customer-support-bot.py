@@ -9,22 +9,42 @@ A complete supervisor-worker system with:
 """
 
 import os
+import asyncio
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, START, END
 from typing import TypedDict, Annotated, Literal
 import operator
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-import json
+from semantic_cache import CachedChatOpenAI, topk_cosine, warm_up, get_logger, make_http_client, run
 from datetime import datetime
+from string import Template
+from pydantic import BaseModel, Field
+import numpy as np
+import tiktoken
+from contextlib import aclosing
+from sentence_transformers import SentenceTransformer
 
 load_dotenv()
 
 
+# ============================================
+# Logging
+# ============================================
+
+log = get_logger("support")
+
+
 # ============================================
 # State Definition
 # ============================================
 
+def merge_in_place(x: dict, y: dict) -> dict:
+    """Reducer: add y's keys to the channel's dict instead of copying it"""
+    x.update(y)
+    return x
+
+
 class SupportState(TypedDict):
     # Customer info
     customer_message: str
@@ -36,11 +56,10 @@ class SupportState(TypedDict):
     messages: Annotated[list, operator.add]
     
     # Worker results
-    worker_outputs: Annotated[dict, lambda x, y: {**x, **y}]
+    worker_outputs: Annotated[dict, merge_in_place]
     
     # Supervisor control
     next_action: str
-    iteration: int
     
     # Final outputs
     response: str
@@ -49,25 +68,213 @@ class SupportState(TypedDict):
 
 
 # ============================================
-# LLM Setup
+# Structured Output Schemas
 # ============================================
+# The model is constrained to these schemas, so replies always parse
+# and labels are always one of the allowed values.
+
+class IntentSchema(BaseModel):
+    intent: Literal["billing", "technical", "account", "feedback", "sales", "general"]
+    priority: Literal["high", "medium", "low"]
+    draft_response: str = Field(description="Reply to the customer, under 150 words")
+
+
+class IntentBatch(BaseModel):
+    results: list[IntentSchema] = Field(description="One result per message, in order")
 
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
+
+class FinalizeSchema(BaseModel):
+    critique: str = Field(description="Short review of the draft; empty if no review was asked for")
+    final_email: str = Field(description="The polished email to send to the customer")
+    needs_human: bool = Field(description="True if a human agent should take over")
 
 
 # ============================================
-# Intent Classifier Node
+# LLM Setup
 # ============================================
 
-def classify_intent(state: SupportState) -> dict:
-    """Classify the customer's intent"""
-    print("🏷️ [Intent Classifier] Analyzing message...")
+# One pooled client for every LLM call; closed at the end of main()
+http_client = make_http_client()
+
+# Near-duplicate prompts are answered from the semantic cache.
+# A classify prompt is a whole batch whose results are matched to the
+# tickets by position, so it is only reused when byte-identical - a
+# similar batch (same tickets reordered, one ticket swapped) would hand
+# one customer another's label and draft.
+llm = CachedChatOpenAI(
+    ChatOpenAI(model="gpt-4o-mini", temperature=0.3, http_async_client=http_client),
+    thresholds={"classify": None},
+)
+intent_llm = llm.with_structured_output(IntentBatch)
+finalize_llm = llm.with_structured_output(FinalizeSchema)
+
+
+# ============================================
+# Local Intent Classifier
+# ============================================
+# Picking one of five labels doesn't need an LLM: embed the message
+# and take the nearest class centroid. The LLM is only asked when the
+# best match is weak.
+
+INTENT_EXAMPLES = {
+    "billing": [
+        "I was charged twice this month",
+        "Can I get a refund for my last payment?",
+        "Where can I download my invoice?",
+        "My credit card was declined when renewing",
+        "How do I cancel my subscription?",
+        "Why did my bill go up?",
+        "I need to update my payment method",
+        "I was billed after I cancelled",
+    ],
+    "technical": [
+        "The app keeps crashing when I open it",
+        "I get an error when uploading files",
+        "The page won't load, it just spins",
+        "Sync stopped working on my phone",
+        "How do I export my data to CSV?",
+        "The integration with Slack is broken",
+        "Notifications are not showing up",
+        "The website is really slow today",
+    ],
+    "account": [
+        "I forgot my password",
+        "How do I reset my password?",
+        "I can't log in to my account",
+        "I want to change the email on my profile",
+        "Someone else may have accessed my account",
+        "How do I enable two-factor authentication?",
+        "My account got locked",
+        "Please delete my account",
+    ],
+    "feedback": [
+        "Your support team was amazing, thank you",
+        "I'm disappointed with the latest update",
+        "It would be great if you added dark mode",
+        "The new design is confusing",
+        "I love using this product every day",
+        "Your service has gotten worse lately",
+        "Just wanted to share a suggestion",
+        "I want to file a complaint about my experience",
+    ],
+    "sales": [
+        "How much does the enterprise plan cost?",
+        "Do you offer discounts for nonprofits?",
+        "I want to upgrade to the pro plan",
+        "What is included in the business tier?",
+        "Can I buy more seats for my team?",
+        "Is there a free trial?",
+        "I'd like to talk to sales about a purchase",
+        "Do you have annual pricing?",
+    ],
+}
+
+PRIORITY_EXAMPLES = {
+    "high": [
+        "This is urgent, our whole team is blocked!",
+        "The service is down and we're losing money",
+        "I was charged twice and I'm really frustrated!",
+        "I have a deadline today and nothing works!",
+        "Someone hacked my account, help immediately",
+        "This is the third time I'm asking, fix it now!!",
+    ],
+    "medium": [
+        "The export button gives me an error",
+        "I can't find my invoice from last month",
+        "How do I reset my password? I forgot it.",
+        "Sync is not working on my laptop",
+        "My payment method needs to be updated",
+        "I get logged out every few minutes",
+    ],
+    "low": [
+        "Just a suggestion: add dark mode",
+        "Thanks, your product is great",
+        "Do you have annual pricing?",
+        "Curious whether you plan a mobile app",
+        "What's included in the pro plan?",
+        "No rush, but how do I change my avatar?",
+    ],
+}
+
+URGENT_WORDS = ("urgent", "asap", "immediately", "now", "frustrated", "angry", "down", "deadline", "losing")
+
+INTENTS = list(INTENT_EXAMPLES)
+PRIORITIES = list(PRIORITY_EXAMPLES)
+
+# Below this cosine the local guess is too weak; ask the LLM instead
+MIN_INTENT_SCORE = 0.35
+
+
+encoder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+
+
+def embed(texts: list[str]) -> np.ndarray:
+    """L2-normalized sentence embeddings, one row per text"""
+    return encoder.encode(texts, normalize_embeddings=True).astype(np.float32)
+
+
+def _unit(rows: np.ndarray) -> np.ndarray:
+    return rows / np.linalg.norm(rows, axis=-1, keepdims=True)
+
+
+def priority_features(message: str, embedding: np.ndarray) -> np.ndarray:
+    """Embedding plus the cues a human would look for in an urgent ticket"""
+    words = message.lower().split()
+    urgent = sum(word.strip("!?.,") in URGENT_WORDS for word in words)
+    exclamations = message.count("!") / max(len(words), 1)
+    return np.concatenate([embedding, [urgent, exclamations * 10, 1.0]]).astype(np.float32)
+
+
+def train_priority_model(steps: int = 300, lr: float = 0.5) -> np.ndarray:
+    """Fit a softmax regression over PRIORITY_EXAMPLES; returns its weights"""
+    messages = [m for label in PRIORITIES for m in PRIORITY_EXAMPLES[label]]
+    labels = np.array([i for i, label in enumerate(PRIORITIES) for _ in PRIORITY_EXAMPLES[label]])
+    
+    features = np.stack([
+        priority_features(m, e) for m, e in zip(messages, embed(messages))
+    ])
+    targets = np.eye(len(PRIORITIES), dtype=np.float32)[labels]
+    weights = np.zeros((features.shape[1], len(PRIORITIES)), dtype=np.float32)
+    
+    for _ in range(steps):
+        logits = features @ weights
+        probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probs /= probs.sum(axis=1, keepdims=True)
+        weights -= lr * (features.T @ (probs - targets) / len(messages) + 1e-3 * weights)
+    
+    return weights
+
+
+# Built once at import: (C, D) class centroids and the priority weights
+intent_centroids = _unit(np.stack([
+    embed(INTENT_EXAMPLES[intent]).mean(axis=0) for intent in INTENTS
+]))
+priority_weights = train_priority_model()
+
+
+def classify_locally(message: str) -> tuple[str, str, float]:
+    """Return (intent, priority, cosine score of the chosen intent)"""
+    embedding = embed([message])[0]
+    
+    top, scores = topk_cosine(intent_centroids, embedding, 1)
+    
+    priority = PRIORITIES[int(np.argmax(priority_features(message, embedding) @ priority_weights))]
     
-    prompt = f"""Classify this customer message into ONE category:
+    return INTENTS[top[0]], priority, float(scores[0])
 
-Customer Message: "{state['customer_message']}"
 
-Categories:
+# ============================================
+# Batched LLM Classification
+# ============================================
+# When the local classifier is unsure, the LLM classifies the message
+# and drafts a reply. Tickets processed concurrently are collected for
+# a short window and sent as ONE prompt, so N uncertain tickets cost a
+# single round-trip.
+
+# Instructions in the system message, the batch in the human message:
+# the fixed part is byte-identical across batches, and the semantic
+# cache only compares the messages themselves
+CLASSIFY_SYSTEM = """Classify each of the customer messages into ONE category:
 - billing: Payment issues, invoices, refunds, subscription
 - technical: Product bugs, errors, how-to questions
 - account: Login issues, password reset, profile updates
@@ -79,40 +286,171 @@ Also determine priority:
 - medium: Standard issues
 - low: General inquiries, feedback
 
-Respond in JSON format:
-{{"intent": "category", "priority": "level"}}
+Finally, draft a helpful, empathetic reply to each customer
+(under 150 words) with clear next steps.
 """
+
+CLASSIFY_PROMPT = Template("""Return exactly $count results, in the same order as the messages.
+
+$numbered
+""")
+
+
+def build_classify_prompt(messages: list[str]) -> list:
+    numbered = "\n".join(f'{i}. "{message}"' for i, message in enumerate(messages, 1))
+    return [
+        SystemMessage(content=CLASSIFY_SYSTEM),
+        HumanMessage(content=CLASSIFY_PROMPT.substitute(count=len(messages), numbered=numbered))
+    ]
+
+
+# Used for every message of a batch whose result count doesn't match
+UNCLASSIFIED = IntentSchema(intent="general", priority="medium", draft_response="")
+
+
+async def classify_with_llm(messages: list[str]) -> list[IntentSchema]:
+    """One LLM call for a whole batch"""
+    batch = await intent_llm.ainvoke(build_classify_prompt(messages), tag="classify")
+    
+    if len(batch.results) != len(messages):
+        return [UNCLASSIFIED for _ in messages]
+    return batch.results
+
+
+class ClassifierBatcher:
+    """
+    Micro-batcher in front of classify_with_llm.
+    
+    classify() waits up to `batch_wait_timeout_s` for other callers; a
+    batch is sent as soon as it reaches `max_batch_size`.
+    """
+    
+    def __init__(self, max_batch_size: int = 16, batch_wait_timeout_s: float = 0.05):
+        self.max_batch_size = max_batch_size
+        self.batch_wait_timeout_s = batch_wait_timeout_s
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.Task | None = None
+        # The event loop only keeps weak references to tasks; hold the
+        # timer and in-flight sends here so they can't be garbage-collected
+        self._tasks: set[asyncio.Task] = set()
+    
+    async def classify(self, message: str) -> IntentSchema:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((message, future))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._spawn(self._send(self._take_batch()))
+        elif self._timer is None:
+            self._timer = self._spawn(self._send_after_timeout())
+        
+        return await future
+    
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+    
+    def _take_batch(self) -> list[tuple[str, asyncio.Future]]:
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+        return batch
+    
+    async def _send_after_timeout(self) -> None:
+        await asyncio.sleep(self.batch_wait_timeout_s)
+        self._timer = None
+        while self._pending:
+            await self._send(self._take_batch())
+    
+    async def _send(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        try:
+            results = await classify_with_llm([message for message, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+llm_classifier = ClassifierBatcher()
+
+
+# ============================================
+# Intent Classifier Node
+# ============================================
+
+def specialist_for(intent: str) -> str:
+    """Worker that owns an intent (feedback, sales, ... go to general)"""
+    if intent in ("billing", "technical", "account"):
+        return intent
+    return "general"
+
+
+async def classify_intent(state: SupportState) -> dict:
+    """Classify the customer's intent (LLM only when the local guess is weak)"""
+    log.info("🏷️ [Intent Classifier] Analyzing message...")
     
-    response = llm.invoke([HumanMessage(content=prompt)])
+    intent, priority, score = classify_locally(state["customer_message"])
+    if score >= MIN_INTENT_SCORE:
+        log.info("   Intent: %s, Priority: %s (local, score %.2f)", intent, priority, score)
+        return {
+            "intent": intent,
+            "priority": priority,
+            "messages": [AIMessage(content=f"Classified as {intent} ({priority} priority)")]
+        }
+    
+    guess = specialist_for(intent)
+    log.info("   Unsure (score %.2f): starting %s worker speculatively", score, guess)
+    speculative = asyncio.create_task(SPECIALISTS[guess](state))
     
     try:
-        result = json.loads(response.content)
-        intent = result.get("intent", "general")
-        priority = result.get("priority", "medium")
-    except:
-        intent = "general"
-        priority = "medium"
+        result = await llm_classifier.classify(state["customer_message"])
+        intent = result.intent
+        priority = result.priority
+        
+        log.info("   Intent: %s, Priority: %s", intent, priority)
+        messages = [AIMessage(content=f"Classified as {intent} ({priority} priority)")]
+        
+        if specialist_for(intent) == guess:
+            log.info("   ⚡ Speculation confirmed")
+            worker = await speculative
+            return {
+                "intent": intent,
+                "priority": priority,
+                "worker_outputs": worker["worker_outputs"],
+                "messages": messages + worker["messages"]
+            }
+    finally:
+        # Wrong guess (or the classifier failed): stop the worker's
+        # request instead of paying for an answer nobody reads
+        if not speculative.done():
+            speculative.cancel()
     
-    print(f"   Intent: {intent}, Priority: {priority}")
+    log.info("   ✂️ Speculation cancelled")
     
+    # The draft is filed under the specialist's key, so if the specialist
+    # runs later its answer replaces the draft instead of sitting next to it
+    draft = result.draft_response
     return {
         "intent": intent,
         "priority": priority,
-        "messages": [AIMessage(content=f"Classified as {intent} ({priority} priority)")]
+        "worker_outputs": {specialist_for(intent): draft} if draft else {},
+        "messages": messages
     }
 
 
 # ============================================
-# Specialized Workers
+# Worker Prompts
 # ============================================
+# Static role instructions go first, in the system message, and nothing
+# per-request is interpolated into them; only the human message (the
+# customer's words) changes between requests.
 
-def billing_worker(state: SupportState) -> dict:
-    """Handle billing-related queries"""
-    print("💳 [Billing Worker] Processing...")
-    
-    prompt = f"""You are a Billing Support Specialist.
-    
-Customer Issue: {state['customer_message']}
+BILLING_SYSTEM = """You are a Billing Support Specialist.
 
 Provide helpful information about:
 - How to view/download invoices
@@ -122,22 +460,8 @@ Provide helpful information about:
 
 Be empathetic and solution-oriented. Keep response under 150 words.
 """
-    
-    response = llm.invoke([HumanMessage(content=prompt)])
-    
-    return {
-        "worker_outputs": {"billing": response.content},
-        "messages": [AIMessage(content=f"[Billing]: {response.content}")]
-    }
 
-
-def technical_worker(state: SupportState) -> dict:
-    """Handle technical support queries"""
-    print("🔧 [Technical Worker] Processing...")
-    
-    prompt = f"""You are a Technical Support Specialist.
-    
-Customer Issue: {state['customer_message']}
+TECHNICAL_SYSTEM = """You are a Technical Support Specialist.
 
 Provide:
 1. Possible causes of the issue
@@ -146,22 +470,8 @@ Provide:
 
 Be clear and technical but accessible. Keep response under 150 words.
 """
-    
-    response = llm.invoke([HumanMessage(content=prompt)])
-    
-    return {
-        "worker_outputs": {"technical": response.content},
-        "messages": [AIMessage(content=f"[Technical]: {response.content}")]
-    }
-
 
-def account_worker(state: SupportState) -> dict:
-    """Handle account-related queries"""
-    print("👤 [Account Worker] Processing...")
-    
-    prompt = f"""You are an Account Support Specialist.
-    
-Customer Issue: {state['customer_message']}
+ACCOUNT_SYSTEM = """You are an Account Support Specialist.
 
 Provide help with:
 - Password reset procedures
@@ -171,87 +481,146 @@ Provide help with:
 
 Be security-conscious but helpful. Keep response under 150 words.
 """
+
+GENERAL_SYSTEM = """You are a Customer Support Representative.
+
+Provide a helpful, friendly response. If you need more information,
+politely ask for it. Keep response under 150 words.
+"""
+
+
+# Per-request parts, compiled once
+CUSTOMER_ISSUE = Template("Customer Issue: $message")
+CUSTOMER_MESSAGE = Template("Customer Message: $message")
+
+# ============================================
+# Specialized Workers
+# ============================================
+
+# Workers stream their reply and stop reading once this many tokens
+# have arrived (~150 words, the length the prompts ask for), instead of
+# waiting for the model to finish on its own. A reply cut off here is
+# not cached.
+MAX_WORKER_TOKENS = 200
+
+encoding = tiktoken.encoding_for_model("gpt-4o-mini")
+
+
+async def stream_capped(messages: list, tag: str) -> str:
+    """Stream a worker reply, cutting it off at MAX_WORKER_TOKENS"""
+    parts = []
+    tokens = 0
+    
+    async with aclosing(llm.astream(messages, tag=tag)) as stream:
+        async for chunk in stream:
+            parts.append(chunk.content)
+            tokens += len(encoding.encode(chunk.content))
+            if tokens >= MAX_WORKER_TOKENS:
+                break
     
-    response = llm.invoke([HumanMessage(content=prompt)])
+    return "".join(parts)
+
+
+async def billing_worker(state: SupportState) -> dict:
+    """Handle billing-related queries"""
+    log.info("💳 [Billing Worker] Processing...")
+    
+    messages = [
+        SystemMessage(content=BILLING_SYSTEM),
+        HumanMessage(content=CUSTOMER_ISSUE.substitute(message=state["customer_message"]))
+    ]
+    
+    reply = await stream_capped(messages, tag="billing")
     
     return {
-        "worker_outputs": {"account": response.content},
-        "messages": [AIMessage(content=f"[Account]: {response.content}")]
+        "worker_outputs": {"billing": reply},
+        "messages": [AIMessage(content=f"[Billing]: {reply}")]
     }
 
 
-def general_worker(state: SupportState) -> dict:
-    """Handle general queries"""
-    print("💬 [General Worker] Processing...")
+async def technical_worker(state: SupportState) -> dict:
+    """Handle technical support queries"""
+    log.info("🔧 [Technical Worker] Processing...")
+    
+    messages = [
+        SystemMessage(content=TECHNICAL_SYSTEM),
+        HumanMessage(content=CUSTOMER_ISSUE.substitute(message=state["customer_message"]))
+    ]
+    
+    reply = await stream_capped(messages, tag="technical")
     
-    prompt = f"""You are a Customer Support Representative.
+    return {
+        "worker_outputs": {"technical": reply},
+        "messages": [AIMessage(content=f"[Technical]: {reply}")]
+    }
+
+
+async def account_worker(state: SupportState) -> dict:
+    """Handle account-related queries"""
+    log.info("👤 [Account Worker] Processing...")
+    
+    messages = [
+        SystemMessage(content=ACCOUNT_SYSTEM),
+        HumanMessage(content=CUSTOMER_ISSUE.substitute(message=state["customer_message"]))
+    ]
     
-Customer Message: {state['customer_message']}
+    reply = await stream_capped(messages, tag="account")
+    
+    return {
+        "worker_outputs": {"account": reply},
+        "messages": [AIMessage(content=f"[Account]: {reply}")]
+    }
 
-Provide a helpful, friendly response. If you need more information,
-politely ask for it. Keep response under 150 words.
-"""
+
+async def general_worker(state: SupportState) -> dict:
+    """Handle general queries"""
+    log.info("💬 [General Worker] Processing...")
+    
+    messages = [
+        SystemMessage(content=GENERAL_SYSTEM),
+        HumanMessage(content=CUSTOMER_MESSAGE.substitute(message=state["customer_message"]))
+    ]
     
-    response = llm.invoke([HumanMessage(content=prompt)])
+    reply = await stream_capped(messages, tag="general")
     
     return {
-        "worker_outputs": {"general": response.content},
-        "messages": [AIMessage(content=f"[General]: {response.content}")]
+        "worker_outputs": {"general": reply},
+        "messages": [AIMessage(content=f"[General]: {reply}")]
     }
 
 
+# Worker node for each specialist_for() key
+SPECIALISTS = {
+    "billing": billing_worker,
+    "technical": technical_worker,
+    "account": account_worker,
+    "general": general_worker,
+}
+
+
 # ============================================
 # Supervisor Node
 # ============================================
 
 def supervisor(state: SupportState) -> dict:
-    """Supervisor decides next action"""
-    print("\n👔 [Supervisor] Making decision...")
+    """
+    Supervisor decides next action
+    
+    It only runs once, after classification: the classifier's draft
+    (or the confirmed speculative worker's answer) goes straight to
+    finalize, otherwise the specialist writes one first. Review of
+    high-priority replies happens inside finalize.
+    """
+    log.info("\n👔 [Supervisor] Making decision...")
+    
+    if state.get("worker_outputs"):
+        next_action = "finalize"
+    else:
+        next_action = f"{specialist_for(state.get('intent', 'general'))}_worker"
     
-    iteration = state.get("iteration", 0)
+    log.info("   → Routing to: %s", next_action)
     
-    # First iteration: route based on intent
-    if iteration == 0:
-        intent = state.get("intent", "general")
-        
-        if intent == "billing":
-            next_action = "billing_worker"
-        elif intent == "technical":
-            next_action = "technical_worker"
-        elif intent == "account":
-            next_action = "account_worker"
-        else:
-            next_action = "general_worker"
-        
-        print(f"   → Routing to: {next_action}")
-        
-        return {
-            "next_action": next_action,
-            "iteration": iteration + 1
-        }
-    
-    # Second iteration: check if we need quality review
-    elif iteration == 1:
-        # High priority gets quality check
-        if state.get("priority") == "high":
-            print("   → High priority: Adding quality check")
-            return {
-                "next_action": "quality_check",
-                "iteration": iteration + 1
-            }
-        else:
-            print("   → Proceeding to finalize")
-            return {
-                "next_action": "finalize",
-                "iteration": iteration + 1
-            }
-    
-    # Otherwise: finalize
-    else:
-        return {
-            "next_action": "finalize",
-            "iteration": iteration + 1
-        }
+    return {"next_action": next_action}
 
 
 def route_supervisor(state: SupportState) -> str:
@@ -260,90 +629,69 @@ def route_supervisor(state: SupportState) -> str:
 
 
 # ============================================
-# Quality Check Node
+# Finalize Response
 # ============================================
+# One structured call both reviews and polishes the reply. High
+# priority tickets get the review checklist and the escalation flag;
+# a separate quality-check node would cost another LLM call and two
+# more graph hops.
 
-def quality_check(state: SupportState) -> dict:
-    """Check response quality for high-priority issues"""
-    print("✅ [Quality Check] Reviewing response...")
-    
-    worker_outputs = state.get("worker_outputs", {})
-    
-    prompt = f"""Review this customer support response for quality:
+FINALIZE_SYSTEM = """Format the draft as a polished customer support email response.
+
+Include:
+- Friendly greeting
+- Clear solution/next steps
+- Professional sign-off
 
-Customer Message: {state['customer_message']}
+Keep the same information but make it flow well.
+Leave the critique empty and set needs_human to false.
+"""
 
-Draft Response: {json.dumps(worker_outputs)}
+REVIEW_AND_FINALIZE_SYSTEM = """Review the customer support draft, then turn it into a polished email response.
 
-Check for:
+First, in the critique, check:
 1. Is it empathetic and professional?
 2. Does it address the customer's concern?
 3. Are next steps clear?
 4. Should this be escalated to a human?
 
-Respond with JSON:
-{{"quality": "good/needs_improvement", "needs_human": true/false, "improved_response": "..."}}
+Then write the final email, fixing anything the critique found. Include:
+- Friendly greeting
+- Clear solution/next steps
+- Professional sign-off
+
+Set needs_human to true if the issue should be escalated to a human.
 """
-    
-    response = llm.invoke([HumanMessage(content=prompt)])
-    
-    try:
-        result = json.loads(response.content)
-        needs_human = result.get("needs_human", False)
-        improved = result.get("improved_response", "")
-        
-        if improved:
-            return {
-                "worker_outputs": {"quality_improved": improved},
-                "needs_human": needs_human,
-                "messages": [AIMessage(content="Quality check completed")]
-            }
-    except:
-        pass
-    
-    return {
-        "needs_human": False,
-        "messages": [AIMessage(content="Quality check completed")]
-    }
 
+# The per-ticket part, sent as the human message
+FINALIZE_REQUEST = Template("""Customer Message: $message
 
-# ============================================
-# Finalize Response
-# ============================================
+Draft Response: $draft
+""")
 
-def finalize_response(state: SupportState) -> dict:
-    """Create the final customer response"""
-    print("📝 [Finalizer] Creating final response...")
-    
-    worker_outputs = state.get("worker_outputs", {})
-    
-    # Use quality-improved version if available
-    if "quality_improved" in worker_outputs:
-        content = worker_outputs["quality_improved"]
-    else:
-        # Combine all worker outputs
-        content = "\n\n".join(worker_outputs.values())
+
+async def finalize_response(state: SupportState) -> dict:
+    """Review (high priority only) and write the final customer response"""
+    log.info("📝 [Finalizer] Creating final response...")
     
-    # Create ticket for high priority
-    ticket_created = state.get("priority") == "high"
+    is_high_priority = state.get("priority") == "high"
+    system = REVIEW_AND_FINALIZE_SYSTEM if is_high_priority else FINALIZE_SYSTEM
     
-    prompt = f"""Format this as a polished customer support email response:
-
-Content: {content}
-
-Include:
-- Friendly greeting
-- Clear solution/next steps
-- Professional sign-off
-
-Keep the same information but make it flow well.
-"""
+    messages = [
+        SystemMessage(content=system),
+        HumanMessage(content=FINALIZE_REQUEST.substitute(
+            message=state["customer_message"],
+            draft="\n\n".join(state.get("worker_outputs", {}).values()),
+        ))
+    ]
     
-    response = llm.invoke([HumanMessage(content=prompt)])
+    result = await finalize_llm.ainvoke(messages, tag="finalize")
     
     return {
-        "response": response.content,
-        "ticket_created": ticket_created
+        "response": result.final_email,
+        "needs_human": is_high_priority and result.needs_human,
+        # Create ticket for high priority
+        "ticket_created": is_high_priority,
     }
 
 
@@ -361,29 +709,25 @@ print("""
 │   └──────────────┘     └───────┬────────┘                       │
 │                                │                                 │
 │                        ┌───────▼────────┐                       │
-│                        │   SUPERVISOR   │◀──────────┐           │
-│                        └───────┬────────┘           │           │
-│                                │                    │           │
-│          ┌─────────────────────┼─────────────────┐  │           │
-│          ▼           ▼         ▼         ▼       │  │           │
-│     ┌────────┐ ┌────────┐ ┌────────┐ ┌────────┐  │  │           │
-│     │BILLING │ │TECHNIC │ │ACCOUNT │ │GENERAL │──┘  │           │
-│     │   💳   │ │   🔧   │ │   👤   │ │   💬   │     │           │
-│     └────────┘ └────────┘ └────────┘ └────────┘     │           │
-│                                                      │           │
-│                        ┌───────────────┐            │           │
-│                        │ QUALITY CHECK │────────────┘           │
-│                        │      ✅       │ (high priority)        │
-│                        └───────┬───────┘                        │
-│                                │                                 │
-│                        ┌───────▼────────┐                       │
-│                        │   FINALIZE     │                       │
-│                        │      📝        │                       │
+│                        │   SUPERVISOR   │                       │
 │                        └───────┬────────┘                       │
 │                                │                                 │
-│                        ┌───────▼────────┐                       │
-│                        │      END       │                       │
-│                        └────────────────┘                       │
+│          ┌─────────────────────┼─────────────────┐  draft ready  │
+│          ▼           ▼         ▼         ▼       │              │
+│     ┌────────┐ ┌────────┐ ┌────────┐ ┌────────┐  │              │
+│     │BILLING │ │TECHNIC │ │ACCOUNT │ │GENERAL │  │              │
+│     │   💳   │ │   🔧   │ │   👤   │ │   💬   │  │              │
+│     └───┬────┘ └───┬────┘ └───┬────┘ └───┬────┘  │              │
+│         └──────────┴────┬─────┴──────────┘       │              │
+│                         │◀───────────────────────┘              │
+│                 ┌───────▼────────┐                               │
+│                 │   FINALIZE     │  high priority:               │
+│                 │      📝        │  review + escalation flag ✅  │
+│                 └───────┬────────┘                               │
+│                         │                                        │
+│                 ┌───────▼────────┐                               │
+│                 │      END       │                               │
+│                 └────────────────┘                               │
 └─────────────────────────────────────────────────────────────────┘
 """)
 
@@ -397,7 +741,6 @@ graph_builder.add_node("billing_worker", billing_worker)
 graph_builder.add_node("technical_worker", technical_worker)
 graph_builder.add_node("account_worker", account_worker)
 graph_builder.add_node("general_worker", general_worker)
-graph_builder.add_node("quality_check", quality_check)
 graph_builder.add_node("finalize", finalize_response)
 
 # Add edges
@@ -413,17 +756,15 @@ graph_builder.add_conditional_edges(
         "technical_worker": "technical_worker",
         "account_worker": "account_worker",
         "general_worker": "general_worker",
-        "quality_check": "quality_check",
         "finalize": "finalize"
     }
 )
 
-# Workers go back to supervisor
-graph_builder.add_edge("billing_worker", "supervisor")
-graph_builder.add_edge("technical_worker", "supervisor")
-graph_builder.add_edge("account_worker", "supervisor")
-graph_builder.add_edge("general_worker", "supervisor")
-graph_builder.add_edge("quality_check", "supervisor")
+# Workers go straight to finalize
+graph_builder.add_edge("billing_worker", "finalize")
+graph_builder.add_edge("technical_worker", "finalize")
+graph_builder.add_edge("account_worker", "finalize")
+graph_builder.add_edge("general_worker", "finalize")
 
 # Finalize goes to END
 graph_builder.add_edge("finalize", END)
@@ -432,11 +773,61 @@ graph_builder.add_edge("finalize", END)
 support_graph = graph_builder.compile()
 
 
+# ============================================
+# Warm-up
+# ============================================
+
+def _warm() -> None:
+    """
+    Pay one-time setup costs at startup instead of on the first ticket:
+    tiktoken's first encode and the Numba similarity kernels. The
+    sentence-transformer is already warm from building the centroids.
+    A server should call this from its startup hook.
+    """
+    encoding.encode("warm up")
+    warm_up()
+
+
+_warm()
+
+
 # ============================================
 # Test the System
 # ============================================
 
-if __name__ == "__main__":
+def new_ticket(message: str, customer_id: str) -> SupportState:
+    """Initial graph state for one customer message"""
+    return {
+        "customer_message": message,
+        "customer_id": customer_id,
+        "intent": "",
+        "priority": "",
+        "messages": [],
+        "worker_outputs": {},
+        "next_action": "",
+        "response": "",
+        "needs_human": False,
+        "ticket_created": False
+    }
+
+
+async def process_batch(tickets: list[dict], concurrency: int = 8) -> list[dict]:
+    """
+    Run independent tickets through the graph concurrently.
+    
+    The semaphore caps how many tickets are in flight, which also caps
+    concurrent requests to the LLM provider. Results keep ticket order.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def bounded(ticket: dict) -> dict:
+        async with semaphore:
+            return await support_graph.ainvoke(new_ticket(ticket["message"], ticket["customer_id"]))
+    
+    return await asyncio.gather(*(bounded(ticket) for ticket in tickets))
+
+
+async def main():
     test_messages = [
         {
             "message": "I was charged twice for my subscription last month and I'm really frustrated!",
@@ -452,28 +843,17 @@ if __name__ == "__main__":
         }
     ]
     
-    for test in test_messages:
+    try:
+        results = await process_batch(test_messages)
+    finally:
+        await http_client.aclose()
+    
+    for test, result in zip(test_messages, results):
         print("\n" + "="*70)
         print(f"📧 Customer Message: {test['message']}")
         print(f"   Customer ID: {test['customer_id']}")
         print("="*70)
         
-        initial_state: SupportState = {
-            "customer_message": test["message"],
-            "customer_id": test["customer_id"],
-            "intent": "",
-            "priority": "",
-            "messages": [],
-            "worker_outputs": {},
-            "next_action": "",
-            "iteration": 0,
-            "response": "",
-            "needs_human": False,
-            "ticket_created": False
-        }
-        
-        result = support_graph.invoke(initial_state)
-        
         print("\n" + "-"*70)
         print("📤 RESPONSE TO CUSTOMER:")
         print("-"*70)
@@ -481,4 +861,8 @@ if __name__ == "__main__":
         print("-"*70)
         print(f"📊 Ticket Created: {result['ticket_created']}")
         print(f"🚨 Needs Human: {result['needs_human']}")
-        print(f"🏷️ Intent: {result['intent']} | Priority: {result['priority']}")
\ No newline at end of file
+        print(f"🏷️ Intent: {result['intent']} | Priority: {result['priority']}")
+
+
+if __name__ == "__main__":
+    run(main())
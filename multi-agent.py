@@ -7,99 +7,182 @@ Create specialized agents that collaborate
 import os
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
 from typing import TypedDict, Annotated, Literal
 import operator
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from semantic_cache import CachedChatOpenAI, get_logger, make_http_client, run
+from pydantic import BaseModel
 
 load_dotenv()
 
 
+# ============================================
+# Logging
+# ============================================
+
+log = get_logger("multi_agent")
+
+
 # ============================================
 # State Definition
 # ============================================
 
 class MultiAgentState(TypedDict):
     user_query: str
+    sub_queries: list[str]
     messages: Annotated[list, operator.add]
+    research_notes: Annotated[list, operator.add]
     research_result: str
     analysis_result: str
     final_response: str
     current_agent: str
 
 
+class ResearchPlan(BaseModel):
+    """Planner output: questions that can be researched independently"""
+    sub_queries: list[str]
+
+
+class ResearchTask(TypedDict):
+    """What one researcher branch receives from the fan-out"""
+    sub_query: str
+
+
 # ============================================
 # Create Specialized LLMs (Agents)
 # ============================================
 
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
+# One pooled client for every LLM call; closed at the end of main()
+http_client = make_http_client()
+
+# Near-duplicate prompts are answered from the semantic cache
+llm = CachedChatOpenAI(
+    ChatOpenAI(model="gpt-4o-mini", temperature=0.7, http_async_client=http_client)
+)
+planner_llm = llm.with_structured_output(ResearchPlan)
+
+
+# ============================================
+# Agent Prompts
+# ============================================
+# Static instructions live in module-level constants so every call
+# sends a byte-identical prefix that the provider can cache; only the
+# human message carries per-query text.
+
+PLANNER_SYSTEM = """You are a Planning Agent.
+        Your job is to break a topic into 2-4 independent research questions
+        that can be answered separately."""
+
+RESEARCHER_SYSTEM = """You are a Research Agent. 
+        Your job is to provide factual information about topics.
+        Be thorough but concise. Focus on key facts."""
+
+ANALYST_SYSTEM = """You are an Analysis Agent.
+        Your job is to analyze information and provide insights.
+        Look for patterns, implications, and key takeaways.
+        Analyze the research findings you are given and provide key insights."""
+
+WRITER_SYSTEM = """You are a Writing Agent.
+        Your job is to create clear, engaging responses.
+        Synthesize information into a well-structured answer.
+        Create a comprehensive, well-written response from the research
+        and analysis you are given."""
 
 
 # ============================================
 # Agent Nodes
 # ============================================
 
-def researcher_agent(state: MultiAgentState) -> dict:
+async def planner_agent(state: MultiAgentState) -> dict:
     """
-    Researcher Agent: Gathers information about the topic
+    Planner Agent: Splits the query into independent research questions
     """
-    print("🔍 Researcher Agent working...")
+    log.info("🗺️ Planner Agent working...")
     
     messages = [
-        SystemMessage(content="""You are a Research Agent. 
-        Your job is to provide factual information about topics.
-        Be thorough but concise. Focus on key facts."""),
-        HumanMessage(content=f"Research this topic: {state['user_query']}")
+        SystemMessage(content=PLANNER_SYSTEM),
+        HumanMessage(content=f"Plan research for this topic: {state['user_query']}")
+    ]
+    
+    plan = await planner_llm.ainvoke(messages, tag="planner")
+    sub_queries = plan.sub_queries
+    
+    # Fall back to researching the whole query in one call
+    if not sub_queries:
+        sub_queries = [state["user_query"]]
+    
+    return {
+        "sub_queries": sub_queries,
+        "current_agent": "planner",
+        "messages": [AIMessage(content=f"[Planner]: {len(sub_queries)} sub-queries")]
+    }
+
+
+def fan_out_research(state: MultiAgentState) -> list[Send]:
+    """One researcher branch per sub-query; LangGraph runs them in parallel"""
+    return [Send("researcher", {"sub_query": query}) for query in state["sub_queries"]]
+
+
+async def researcher_agent(state: ResearchTask) -> dict:
+    """
+    Researcher Agent: Gathers information about one sub-query
+    """
+    log.info("🔍 Researcher Agent working on: %s", state["sub_query"])
+    
+    messages = [
+        SystemMessage(content=RESEARCHER_SYSTEM),
+        HumanMessage(content=f"Research this topic: {state['sub_query']}")
     ]
     
-    response = llm.invoke(messages)
+    response = await llm.ainvoke(messages, tag="researcher")
+    note = f"{state['sub_query']}\n{response.content}"
     
+    # Branches run in parallel, so only reducer keys may be written here
     return {
-        "research_result": response.content,
-        "current_agent": "researcher",
-        "messages": [AIMessage(content=f"[Researcher]: {response.content}")]
+        "research_notes": [note],
+        "messages": [AIMessage(content=f"[Researcher]: {note}")]
     }
 
 
-def analyst_agent(state: MultiAgentState) -> dict:
+async def analyst_agent(state: MultiAgentState) -> dict:
     """
     Analyst Agent: Analyzes the research and provides insights
     """
-    print("📊 Analyst Agent working...")
+    log.info("📊 Analyst Agent working...")
+    
+    # Join the parallel researchers' notes (in plan order)
+    research = "\n\n".join(state["research_notes"])
     
     messages = [
-        SystemMessage(content="""You are an Analysis Agent.
-        Your job is to analyze information and provide insights.
-        Look for patterns, implications, and key takeaways."""),
+        SystemMessage(content=ANALYST_SYSTEM),
         HumanMessage(content=f"""
         Original Query: {state['user_query']}
         
         Research Findings:
-        {state['research_result']}
-        
-        Please analyze this information and provide key insights.
+        {research}
         """)
     ]
     
-    response = llm.invoke(messages)
+    response = await llm.ainvoke(messages, tag="analyst")
     
     return {
+        "research_result": research,
         "analysis_result": response.content,
         "current_agent": "analyst",
         "messages": [AIMessage(content=f"[Analyst]: {response.content}")]
     }
 
 
-def writer_agent(state: MultiAgentState) -> dict:
+async def writer_agent(state: MultiAgentState) -> dict:
     """
     Writer Agent: Creates the final response
     """
-    print("✍️ Writer Agent working...")
+    log.info("✍️ Writer Agent working...")
     
     messages = [
-        SystemMessage(content="""You are a Writing Agent.
-        Your job is to create clear, engaging responses.
-        Synthesize information into a well-structured answer."""),
+        SystemMessage(content=WRITER_SYSTEM),
         HumanMessage(content=f"""
         Original Query: {state['user_query']}
         
@@ -108,12 +191,10 @@ def writer_agent(state: MultiAgentState) -> dict:
         
         Analysis:
         {state['analysis_result']}
-        
-        Create a comprehensive, well-written response.
         """)
     ]
     
-    response = llm.invoke(messages)
+    response = await llm.ainvoke(messages, tag="writer")
     
     return {
         "final_response": response.content,
@@ -129,12 +210,14 @@ def writer_agent(state: MultiAgentState) -> dict:
 graph_builder = StateGraph(MultiAgentState)
 
 # Add agent nodes
+graph_builder.add_node("planner", planner_agent)
 graph_builder.add_node("researcher", researcher_agent)
 graph_builder.add_node("analyst", analyst_agent)
 graph_builder.add_node("writer", writer_agent)
 
-# Define the flow: Researcher → Analyst → Writer
-graph_builder.add_edge(START, "researcher")
+# Define the flow: Planner → Researchers (one per sub-query) → Analyst → Writer
+graph_builder.add_edge(START, "planner")
+graph_builder.add_conditional_edges("planner", fan_out_research, ["researcher"])
 graph_builder.add_edge("researcher", "analyst")
 graph_builder.add_edge("analyst", "writer")
 graph_builder.add_edge("writer", END)
@@ -152,13 +235,13 @@ print("""
 │                    MULTI-AGENT PIPELINE                          │
 ├─────────────────────────────────────────────────────────────────┤
 │                                                                  │
-│   ┌───────────┐    ┌───────────┐    ┌───────────┐              │
-│   │ 🔍        │    │ 📊        │    │ ✍️         │              │
-│   │ RESEARCHER│───▶│ ANALYST   │───▶│ WRITER    │              │
-│   │           │    │           │    │           │              │
-│   │ Gathers   │    │ Analyzes  │    │ Creates   │              │
-│   │ facts     │    │ insights  │    │ response  │              │
-│   └───────────┘    └───────────┘    └───────────┘              │
+│  ┌──────────┐   ┌──────────┐   ┌──────────┐   ┌──────────┐     │
+│  │ 🗺️        │   │ 🔍        │   │ 📊        │   │ ✍️        │     │
+│  │ PLANNER  │──▶│RESEARCHER│──▶│ ANALYST  │──▶│ WRITER   │     │
+│  │          │   │          │   │          │   │          │     │
+│  │ Splits   │   │ Parallel │   │ Analyzes │   │ Creates  │     │
+│  │ query    │   │ lookups  │   │ insights │   │ response │     │
+│  └──────────┘   └──────────┘   └──────────┘   └──────────┘     │
 │                                                                  │
 └─────────────────────────────────────────────────────────────────┘
 """)
@@ -168,7 +251,7 @@ print("""
 # Run the Multi-Agent System
 # ============================================
 
-if __name__ == "__main__":
+async def main():
     query = "What are the benefits and challenges of remote work?"
     
     print(f"\n📝 Query: {query}\n")
@@ -176,16 +259,25 @@ if __name__ == "__main__":
     
     initial_state = {
         "user_query": query,
+        "sub_queries": [],
         "messages": [],
+        "research_notes": [],
         "research_result": "",
         "analysis_result": "",
         "final_response": "",
         "current_agent": ""
     }
     
-    result = graph.invoke(initial_state)
+    try:
+        result = await graph.ainvoke(initial_state)
+    finally:
+        await http_client.aclose()
     
     print("\n" + "="*60)
     print("📋 FINAL RESPONSE:")
     print("="*60)
-    print(result["final_response"])
\ No newline at end of file
+    print(result["final_response"])
+
+
+if __name__ == "__main__":
+    run(main())
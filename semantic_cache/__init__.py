@@ -0,0 +1,28 @@
+"""
+Semantic Response Cache
+=======================
+Wrap a chat model so near-duplicate prompts are answered from a local
+vector index instead of a fresh API round-trip.
+
+CachedLLM is the cheaper exact-match variant: only identical prompts
+hit, but there is no embedding call on the way.
+
+get_logger, make_http_client and run are the logging, HTTP and event
+loop set-up the example scripts share.
+"""
+
+from semantic_cache._kernels import topk_cosine, warm_up
+from semantic_cache.cache import CachedChatOpenAI
+from semantic_cache.exact import CachedLLM
+from semantic_cache.runtime import get_logger, make_http_client, run, set_log_format
+
+__all__ = [
+    "CachedChatOpenAI",
+    "CachedLLM",
+    "get_logger",
+    "make_http_client",
+    "run",
+    "set_log_format",
+    "topk_cosine",
+    "warm_up",
+]
@@ -0,0 +1,132 @@
+"""
+Similarity Kernels
+==================
+topk_cosine scores every row of a matrix of L2-normalized vectors
+against a normalized query (so the dot product IS the cosine) and
+returns the k best rows, best first.
+
+topk_cosine_int8 does the same over int8 codes with one float scale per
+row (see quantize_int8): a quarter of the memory traffic of float32,
+which is what bounds the scan once the matrix outgrows the CPU cache.
+Cosine error from quantization is well under 1%.
+
+With Numba installed the scans are compiled to parallel loops, which
+beat NumPy on small 384-d vectors where per-call dispatch dominates.
+Without Numba the same API runs on plain NumPy.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+def quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization: vectors ≈ codes * scales[:, None]"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _topk_numpy(scores: np.ndarray, k: int):
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return top.astype(np.int64), scores[top].astype(np.float32)
+
+
+if njit is not None:
+
+    @njit(cache=True)
+    def _select_topk(scores, k):
+        # k is tiny (usually 1): keep a sorted insertion buffer, not a heap
+        top = np.empty(k, dtype=np.int64)
+        best = np.empty(k, dtype=np.float32)
+        filled = 0
+        for i in range(len(scores)):
+            score = scores[i]
+            if filled < k:
+                pos = filled
+                filled += 1
+            elif score > best[k - 1]:
+                pos = k - 1
+            else:
+                continue
+            while pos > 0 and best[pos - 1] < score:
+                best[pos] = best[pos - 1]
+                top[pos] = top[pos - 1]
+                pos -= 1
+            best[pos] = score
+            top[pos] = i
+        return top, best
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _topk_numba(matrix, query, k):
+        n, d = matrix.shape
+        scores = np.empty(n, dtype=np.float32)
+        for i in prange(n):
+            acc = np.float32(0.0)
+            for j in range(d):
+                acc += matrix[i, j] * query[j]
+            scores[i] = acc
+        return _select_topk(scores, k)
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _topk_int8_numba(codes, scales, query_codes, query_scale, k):
+        n, d = codes.shape
+        scores = np.empty(n, dtype=np.float32)
+        for i in prange(n):
+            acc = np.int32(0)
+            for j in range(d):
+                acc += np.int32(codes[i, j]) * np.int32(query_codes[j])
+            scores[i] = acc * scales[i] * query_scale
+        return _select_topk(scores, k)
+
+
+def _empty():
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+
+def topk_cosine(matrix: np.ndarray, query: np.ndarray, k: int = 1):
+    """Indices and scores of the k rows most similar to `query`"""
+    k = min(k, len(matrix))
+    if k == 0:
+        return _empty()
+    
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    query = np.ascontiguousarray(query, dtype=np.float32)
+    
+    if njit is None:
+        return _topk_numpy(matrix @ query, k)
+    return _topk_numba(matrix, query, k)
+
+
+def topk_cosine_int8(codes: np.ndarray, scales: np.ndarray, query: np.ndarray, k: int = 1):
+    """topk_cosine over int8 codes + per-row scales (from quantize_int8)"""
+    k = min(k, len(codes))
+    if k == 0:
+        return _empty()
+    
+    query_codes, query_scale = quantize_int8(query)
+    query_codes, query_scale = query_codes[0], query_scale[0]
+    
+    if njit is None:
+        scores = (codes @ query_codes.astype(np.float32)) * scales * query_scale
+        return _topk_numpy(scores.astype(np.float32), k)
+    return _topk_int8_numba(codes, scales, query_codes, query_scale, k)
+
+
+def warm_up() -> None:
+    """
+    Compile both kernels now (or load them from Numba's on-disk cache)
+    so the first real lookup doesn't pay for it. Numba specializes on
+    dtypes, not sizes, so a single 384-d row is enough.
+    """
+    matrix = np.zeros((1, 384), dtype=np.float32)
+    matrix[0, 0] = 1.0
+    topk_cosine(matrix, matrix[0])
+    codes, scales = quantize_int8(matrix)
+    topk_cosine_int8(codes, scales, matrix[0])
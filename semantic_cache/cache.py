@@ -0,0 +1,289 @@
+"""
+CachedChatOpenAI: a semantic cache in front of ChatOpenAI
+=========================================================
+Every prompt's per-request part (its last human message) is embedded
+and compared (cosine similarity) against the prompts answered before
+under the same tag and the same instructions. Close enough → the stored
+answer comes back as an AIMessage and the model is never called.
+
+The rest of the prompt (system text, few-shot examples, ...) is never
+embedded: it is the same for every request, so it would pull unrelated
+requests together. Instead it is matched exactly - prompts with
+different instructions never share answers.
+
+Entries are persisted in SQLite, so the cache survives restarts.
+"""
+
+import hashlib
+import sqlite3
+from contextlib import aclosing
+
+import numpy as np
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_openai import OpenAIEmbeddings
+
+from semantic_cache._kernels import quantize_int8, topk_cosine_int8
+
+
+DEFAULT_THRESHOLD = 0.92
+EMBEDDING_MEMO_SIZE = 1024
+
+
+def _hash(text: str) -> str:
+    """Stable key for a prompt (same scheme as LangChain's cache _hash)"""
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+def _message_text(message) -> str:
+    if isinstance(message, BaseMessage):
+        return f"{message.type}: {message.content}"
+    return str(message)
+
+
+def _split_prompt(input) -> tuple[str, str]:
+    """
+    (instructions, request) of a prompt (string or message list).
+    
+    The request is the last human message - the part that changes per
+    call; the instructions are every other message.
+    """
+    if isinstance(input, str):
+        return "", input
+    
+    messages = list(input)
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], BaseMessage) and messages[i].type == "human":
+            request = messages.pop(i).content
+            return "\n".join(_message_text(m) for m in messages), request
+    return "\n".join(_message_text(m) for m in messages), ""
+
+
+class _TagIndex:
+    """
+    Prompt vectors and their cached answers for one tag.
+    
+    Vectors are kept as int8 codes plus one scale per row - a quarter of
+    the float32 footprint, and the lookup scans less memory.
+    """
+
+    def __init__(self):
+        self.contents: list[str] = []
+        self._codes: np.ndarray | None = None
+        self._scales: np.ndarray | None = None
+
+    def add(self, vector: np.ndarray, content: str) -> None:
+        n = len(self.contents)
+        # Grow by doubling so inserts don't copy the whole matrix each time
+        if self._codes is None:
+            self._codes = np.empty((16, len(vector)), dtype=np.int8)
+            self._scales = np.empty(16, dtype=np.float32)
+        elif n == len(self._codes):
+            codes = np.empty((2 * n, self._codes.shape[1]), dtype=np.int8)
+            scales = np.empty(2 * n, dtype=np.float32)
+            codes[:n] = self._codes
+            scales[:n] = self._scales
+            self._codes, self._scales = codes, scales
+        
+        codes, scales = quantize_int8(vector)
+        self._codes[n] = codes[0]
+        self._scales[n] = scales[0]
+        self.contents.append(content)
+
+    def search(self, vector: np.ndarray, threshold: float) -> str | None:
+        n = len(self.contents)
+        if not n:
+            return None
+        top, scores = topk_cosine_int8(self._codes[:n], self._scales[:n], vector, 1)
+        if scores[0] > threshold:
+            return self.contents[top[0]]
+        return None
+
+
+class CachedChatOpenAI:
+    """
+    Drop-in wrapper around a chat model with a semantic response cache.
+    
+    Call invoke/ainvoke/astream with a `tag` (e.g. "billing", "classify") so
+    different nodes never answer each other's prompts. `thresholds` lets
+    a tag use a stricter similarity cut-off than the default, or None
+    for exact matches only (no embedding call).
+    Keep the static instructions in system messages and the request in
+    the last human message: only the request is compared by similarity.
+    Anything else (bind_tools, batch, ...) is passed to the wrapped model.
+    """
+
+    def __init__(
+        self,
+        llm,
+        embeddings=None,
+        path: str = "semantic_cache.db",
+        threshold: float = DEFAULT_THRESHOLD,
+        thresholds: dict[str, float | None] | None = None,
+    ):
+        self.llm = llm
+        self.embeddings = embeddings or OpenAIEmbeddings(model="text-embedding-3-small")
+        self.threshold = threshold
+        self.thresholds = thresholds or {}
+        
+        self._answers: dict[str, str] = {}
+        self._indexes: dict[str, _TagIndex] = {}
+        self._vectors: dict[str, np.ndarray] = {}
+        
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, tag TEXT, vector BLOB, content TEXT)"
+        )
+        for key, index, vector, content in self._db.execute(
+            "SELECT key, tag, vector, content FROM responses"
+        ):
+            if vector is not None:
+                vector = np.frombuffer(vector, dtype=np.float32)
+            self._remember(key, index, vector, content)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    # ---------- Public API ----------
+
+    def invoke(self, input, config=None, *, tag: str = "default", **kwargs) -> AIMessage:
+        key, index, vector, cached = self._find(input, tag)
+        if cached is not None:
+            return AIMessage(content=cached)
+        
+        response = self.llm.invoke(input, config, **kwargs)
+        self._store(key, index, vector, response.content)
+        return response
+
+    async def ainvoke(self, input, config=None, *, tag: str = "default", **kwargs) -> AIMessage:
+        key, index, vector, cached = await self._afind(input, tag)
+        if cached is not None:
+            return AIMessage(content=cached)
+        
+        response = await self.llm.ainvoke(input, config, **kwargs)
+        self._store(key, index, vector, response.content)
+        return response
+
+    async def astream(self, input, config=None, *, tag: str = "default", **kwargs):
+        """
+        Stream a response; a cache hit arrives as a single chunk.
+        
+        Only a stream that was read to the end is cached - a partial
+        answer (e.g. cut off at a token cap) must not be served for the
+        full prompt later.
+        """
+        key, index, vector, cached = await self._afind(input, tag)
+        if cached is not None:
+            yield AIMessageChunk(content=cached)
+            return
+        
+        parts = []
+        async with aclosing(self.llm.astream(input, config, **kwargs)) as stream:
+            async for chunk in stream:
+                parts.append(chunk.content)
+                yield chunk
+        self._store(key, index, vector, "".join(parts))
+
+    def with_structured_output(self, schema, **kwargs) -> "_CachedStructuredOutput":
+        """Structured-output runnable (Pydantic schema) backed by this cache"""
+        return _CachedStructuredOutput(self, self.llm.with_structured_output(schema, **kwargs), schema)
+
+    # ---------- Internals ----------
+
+    def _find(self, input, tag: str):
+        """(cache key, index, prompt vector, cached answer or None) for a prompt"""
+        instructions, request = _split_prompt(input)
+        key = _hash(f"{tag}\n{instructions}\n{request}")
+        index = self._index_name(tag, instructions)
+        if key in self._answers:
+            return key, index, None, self._answers[key]
+        if self._exact_only(tag):
+            return key, index, None, None
+        
+        text_key = _hash(request)
+        vector = self._vectors.get(text_key)
+        if vector is None:
+            vector = self._memo(text_key, self.embeddings.embed_query(request))
+        return key, index, vector, self._lookup(tag, index, vector)
+
+    async def _afind(self, input, tag: str):
+        instructions, request = _split_prompt(input)
+        key = _hash(f"{tag}\n{instructions}\n{request}")
+        index = self._index_name(tag, instructions)
+        if key in self._answers:
+            return key, index, None, self._answers[key]
+        if self._exact_only(tag):
+            return key, index, None, None
+        
+        text_key = _hash(request)
+        vector = self._vectors.get(text_key)
+        if vector is None:
+            vector = self._memo(text_key, await self.embeddings.aembed_query(request))
+        return key, index, vector, self._lookup(tag, index, vector)
+
+    def _exact_only(self, tag: str) -> bool:
+        return tag in self.thresholds and self.thresholds[tag] is None
+
+    @staticmethod
+    def _index_name(tag: str, instructions: str) -> str:
+        """Similarity index for a tag + exact instructions"""
+        return f"{tag}:{_hash(instructions)}"
+
+    def _memo(self, text_key: str, embedding) -> np.ndarray:
+        """Normalize an embedding and memoize it by prompt hash"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        
+        if len(self._vectors) >= EMBEDDING_MEMO_SIZE:
+            self._vectors.pop(next(iter(self._vectors)))
+        self._vectors[text_key] = vector
+        return vector
+
+    def _lookup(self, tag: str, index: str, vector: np.ndarray) -> str | None:
+        tag_index = self._indexes.get(index)
+        if tag_index is None:
+            return None
+        return tag_index.search(vector, self.thresholds.get(tag, self.threshold))
+
+    def _remember(self, key: str, index: str, vector: np.ndarray | None, content: str) -> None:
+        self._answers[key] = content
+        if vector is not None:  # None: exact-match tag, not searchable
+            self._indexes.setdefault(index, _TagIndex()).add(vector, content)
+
+    def _store(self, key: str, index: str, vector: np.ndarray | None, content: str) -> None:
+        self._remember(key, index, vector, content)
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+            (key, index, None if vector is None else vector.tobytes(), content),
+        )
+        self._db.commit()
+
+
+class _CachedStructuredOutput:
+    """
+    with_structured_output() through the cache: results are stored as
+    the schema's JSON and validated back into the schema on a hit.
+    """
+
+    def __init__(self, cache: CachedChatOpenAI, runnable, schema):
+        self.cache = cache
+        self.runnable = runnable
+        self.schema = schema
+
+    def invoke(self, input, config=None, *, tag: str = "default"):
+        key, index, vector, cached = self.cache._find(input, tag)
+        if cached is not None:
+            return self.schema.model_validate_json(cached)
+        
+        result = self.runnable.invoke(input, config)
+        self.cache._store(key, index, vector, result.model_dump_json())
+        return result
+
+    async def ainvoke(self, input, config=None, *, tag: str = "default"):
+        key, index, vector, cached = await self.cache._afind(input, tag)
+        if cached is not None:
+            return self.schema.model_validate_json(cached)
+        
+        result = await self.runnable.ainvoke(input, config)
+        self.cache._store(key, index, vector, result.model_dump_json())
+        return result
@@ -0,0 +1,225 @@
+"""
+CachedLLM: an exact-match cache in front of a chat model
+========================================================
+The message list is hashed (type + content of every message) together
+with the wrapped model's name, temperature and bound arguments; the
+same prompt to the same model again is answered from memory without
+calling it. No embeddings, so a hit costs a dict lookup.
+
+Recently used answers stay in an in-memory LRU. With a `path`, every
+answer is also written to SQLite, so re-running the same tasks is free
+across restarts.
+"""
+
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict
+from contextlib import aclosing
+
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+
+
+DEFAULT_MAXSIZE = 1024
+
+
+def _pairs(input) -> list:
+    """A prompt (string or message list) as (type, content) pairs"""
+    if isinstance(input, str):
+        return [("human", input)]
+    return [(m.type, m.content) if isinstance(m, BaseMessage) else m for m in input]
+
+
+def _key(input) -> str:
+    """blake2b of the prompt's (type, content) pairs"""
+    return hashlib.blake2b(json.dumps(_pairs(input), sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _model_id(llm) -> str:
+    """
+    What decides a model's answer besides the prompt: name, temperature
+    and arguments bound with .bind(). Part of every key, so models that
+    share a cache file never answer for each other.
+    """
+    return json.dumps({
+        "model": getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__,
+        "temperature": getattr(llm, "temperature", None),
+        "kwargs": getattr(llm, "kwargs", {}),
+    }, sort_keys=True, default=str)
+
+
+class CachedLLM:
+    """
+    Drop-in wrapper around a chat model with an exact-match cache.
+
+    `hits` and `misses` count cache outcomes since start-up. Anything
+    else (bind_tools, batch, ...) is passed to the wrapped model.
+    """
+
+    def __init__(self, llm, path: str | None = "llm_cache.db", maxsize: int = DEFAULT_MAXSIZE):
+        self.llm = llm
+        self._model_id = _model_id(llm)
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        
+        self._answers: OrderedDict[str, str] = OrderedDict()
+        
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, content TEXT)"
+            )
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    # ---------- Public API ----------
+
+    def invoke(self, input, config=None, **kwargs) -> AIMessage:
+        key = self._key(input)
+        cached = self._get(key)
+        if cached is not None:
+            return AIMessage(content=cached)
+        
+        response = self.llm.invoke(input, config, **kwargs)
+        self._put(key, response.content)
+        return response
+
+    async def ainvoke(self, input, config=None, **kwargs) -> AIMessage:
+        key = self._key(input)
+        cached = self._get(key)
+        if cached is not None:
+            return AIMessage(content=cached)
+        
+        response = await self.llm.ainvoke(input, config, **kwargs)
+        self._put(key, response.content)
+        return response
+
+    async def astream(self, input, config=None, **kwargs):
+        """
+        Stream a response; a cache hit arrives as a single chunk.
+        
+        Only a stream that was read to the end is cached - a partial
+        answer must not be served for the full prompt later.
+        """
+        key = self._key(input)
+        cached = self._get(key)
+        if cached is not None:
+            yield AIMessageChunk(content=cached)
+            return
+        
+        parts = []
+        async with aclosing(self.llm.astream(input, config, **kwargs)) as stream:
+            async for chunk in stream:
+                parts.append(chunk.content)
+                yield chunk
+        self._put(key, "".join(parts))
+
+    async def abatch(self, inputs: list, config=None) -> list[AIMessage]:
+        """Many prompts at once: hits come from the cache, misses go out in one abatch"""
+        return await self._abatch(
+            self.llm, [self._key(input) for input in inputs], inputs, config,
+            load=lambda content: AIMessage(content=content),
+            dump=lambda response: response.content,
+        )
+
+    def with_structured_output(self, schema, **kwargs) -> "_CachedStructuredOutput":
+        """Structured-output runnable (Pydantic schema) backed by this cache"""
+        return _CachedStructuredOutput(self, self.llm.with_structured_output(schema, **kwargs), schema)
+
+    # ---------- Internals ----------
+
+    def _key(self, input) -> str:
+        return _key([("model", self._model_id), *_pairs(input)])
+
+    async def _abatch(self, runnable, keys: list[str], inputs: list, config, load, dump) -> list:
+        results = [None] * len(inputs)
+        misses = []
+        for i, key in enumerate(keys):
+            cached = self._get(key)
+            if cached is None:
+                misses.append(i)
+            else:
+                results[i] = load(cached)
+        
+        if misses:
+            responses = await runnable.abatch([inputs[i] for i in misses], config)
+            for i, response in zip(misses, responses):
+                self._put(keys[i], dump(response))
+                results[i] = response
+        return results
+
+    def _get(self, key: str) -> str | None:
+        content = self._answers.get(key)
+        if content is None and self._db is not None:
+            row = self._db.execute(
+                "SELECT content FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                content = row[0]
+                self._remember(key, content)
+        
+        if content is None:
+            self.misses += 1
+            return None
+        
+        self._answers.move_to_end(key)
+        self.hits += 1
+        return content
+
+    def _remember(self, key: str, content: str) -> None:
+        self._answers[key] = content
+        if len(self._answers) > self.maxsize:
+            self._answers.popitem(last=False)
+
+    def _put(self, key: str, content: str) -> None:
+        self._remember(key, content)
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?)", (key, content)
+            )
+            self._db.commit()
+
+
+class _CachedStructuredOutput:
+    """
+    with_structured_output() through the cache: results are stored as
+    the schema's JSON and validated back into the schema on a hit.
+    The schema name is part of the key, so the same prompt asked for
+    plain text never returns this JSON.
+    """
+
+    def __init__(self, cache: CachedLLM, runnable, schema):
+        self.cache = cache
+        self.runnable = runnable
+        self.schema = schema
+
+    def invoke(self, input, config=None):
+        key = self.cache._key([("schema", self.schema.__name__), *_pairs(input)])
+        cached = self.cache._get(key)
+        if cached is not None:
+            return self.schema.model_validate_json(cached)
+        
+        result = self.runnable.invoke(input, config)
+        self.cache._put(key, result.model_dump_json())
+        return result
+
+    async def ainvoke(self, input, config=None):
+        key = self.cache._key([("schema", self.schema.__name__), *_pairs(input)])
+        cached = self.cache._get(key)
+        if cached is not None:
+            return self.schema.model_validate_json(cached)
+        
+        result = await self.runnable.ainvoke(input, config)
+        self.cache._put(key, result.model_dump_json())
+        return result
+
+    async def abatch(self, inputs: list, config=None) -> list:
+        keys = [self.cache._key([("schema", self.schema.__name__), *_pairs(input)]) for input in inputs]
+        return await self.cache._abatch(
+            self.runnable, keys, inputs, config,
+            load=self.schema.model_validate_json,
+            dump=lambda result: result.model_dump_json(),
+        )
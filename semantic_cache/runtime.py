@@ -0,0 +1,77 @@
+"""
+Runtime helpers shared by the example scripts
+=============================================
+get_logger: node progress goes through a queue - the node only enqueues
+the record and one background thread writes it to stdout, so concurrent
+graph runs don't block on the terminal.
+
+make_http_client: one connection pool for every LLM call, so requests
+reuse warm TLS connections (multiplexed over HTTP/2 when h2 is
+installed) instead of setting one up per call.
+
+run: runs the script's main() on uvloop when installed, whose event
+loop schedules tasks faster than the default one.
+"""
+
+import asyncio
+import atexit
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+import httpx
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import h2  # noqa: F401 - lets httpx speak HTTP/2
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+
+_queue = queue.Queue(-1)
+_console = logging.StreamHandler(sys.stdout)
+_listener: QueueListener | None = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger whose records are written to stdout by a background thread"""
+    global _listener
+    if _listener is None:
+        _listener = QueueListener(_queue, _console)
+        _listener.start()
+        atexit.register(_listener.stop)  # flush whatever is still queued
+    
+    log = logging.getLogger(name)
+    if not log.handlers:
+        log.addHandler(QueueHandler(_queue))
+        log.setLevel(logging.INFO)
+        log.propagate = False
+    return log
+
+
+def set_log_format(fmt: str) -> None:
+    """Record format for every get_logger() logger (bare message by default)"""
+    _console.setFormatter(logging.Formatter(fmt))
+
+
+def make_http_client() -> httpx.AsyncClient:
+    """Pooled async HTTP client for ChatOpenAI(http_async_client=...); the caller closes it"""
+    return httpx.AsyncClient(
+        http2=HTTP2,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=100),
+        timeout=60.0,
+    )
+
+
+def run(main) -> None:
+    """asyncio.run(main), on uvloop when it is installed"""
+    if uvloop is not None:
+        uvloop.run(main)
+    else:
+        asyncio.run(main)
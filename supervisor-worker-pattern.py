@@ -6,20 +6,48 @@ This is the most powerful multi-agent pattern!
 """
 
 import os
+import functools
+import asyncio
+import sys
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, START, END
 from typing import TypedDict, Annotated, Literal
 import operator
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableConfig
+from semantic_cache import CachedLLM, get_logger, set_log_format
 import json
+from pydantic import BaseModel, Field
+import tiktoken
+from contextlib import aclosing
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 load_dotenv()
 
+
+# ============================================
+# Logging
+# ============================================
+
+log = get_logger("supervisor_worker")
+
+
 # ============================================
 # State Definition
 # ============================================
 
+def merge_in_place(x: dict, y: dict) -> dict:
+    """Reducer: add y's keys to the channel's dict instead of copying it"""
+    x.update(y)
+    return x
+
+
 class SupervisorState(TypedDict):
     # The original task/query
     task: str
@@ -31,235 +59,466 @@ class SupervisorState(TypedDict):
     next_worker: str
     
     # Results from each worker
-    worker_results: Annotated[dict, lambda x, y: {**x, **y}]
+    worker_results: Annotated[dict, merge_in_place]
     
     # Final answer
     final_answer: str
-    
-    # Iteration counter (to prevent infinite loops)
-    iteration: int
+
+
+class WorkerReply(BaseModel):
+    """A worker's answer plus who should continue (peer handoff)"""
+    content: str = Field(description="Your contribution to the task")
+    next_worker: Literal["researcher", "coder", "writer", "finish"] = Field(
+        description="Teammate who should continue, or finish if the task is complete"
+    )
+
+
+class Route(BaseModel):
+    """The LLM supervisor's triage decision"""
+    next: Literal["researcher", "coder", "writer"] = Field(
+        description="Worker who should start on the task"
+    )
 
 
 # ============================================
 # Initialize LLM
 # ============================================
 
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+# Identical prompts to the same model (e.g. re-running the same task)
+# are answered from the exact-match cache, persisted in llm_cache.db
+# between runs
+llm = CachedLLM(ChatOpenAI(model="gpt-4o", temperature=0))
+worker_llm = llm.with_structured_output(WorkerReply)
+
+# Routing and condensing long outputs don't need the strong model: a
+# small one is enough, and gpt-4o is kept for the workers and finalizer
+small_llm = CachedLLM(ChatOpenAI(model="gpt-4o-mini", temperature=0))
+structured_router = small_llm.with_structured_output(Route)
 
 
 # ============================================
-# Worker Definitions
+# Worker Prompts
 # ============================================
+# Static instructions live in module-level constants and go first, so
+# every call to a worker starts with a byte-identical prefix that the
+# provider can cache; the task and the earlier results come last.
 
-WORKERS = ["researcher", "coder", "writer"]
+# Workers hand off to each other directly instead of returning to the
+# supervisor after every step
+HANDOFF_SYSTEM = """
 
+        Your teammates: researcher (facts and data), coder (code and
+        technical solutions), writer (polished content). When you are done,
+        set next_worker to the teammate who should continue, or to finish
+        if the task is complete."""
 
-def researcher_worker(state: SupervisorState) -> dict:
-    """Research Worker: Finds information and facts"""
-    print("  🔍 [Researcher Worker] Working...")
-    
-    messages = [
-        SystemMessage(content="""You are a Research Worker.
+RESEARCHER_SYSTEM = """You are a Research Worker.
         Your job is to find relevant information, facts, and data.
         Be thorough and cite your reasoning.
-        Keep your response focused and under 200 words."""),
-        HumanMessage(content=f"""
-        Task: {state['task']}
-        
-        Previous work done: {json.dumps(state.get('worker_results', {}), indent=2)}
+        Keep your response focused and under 200 words.
+        Provide your research findings, using the task and any previous work below.""" + HANDOFF_SYSTEM
+
+CODER_SYSTEM = """You are a Coding Worker.
+        Your job is to write code, technical solutions, or pseudocode.
+        Explain your code clearly.
+        Keep your response focused.
+        Provide your technical solution, using the task and any previous work below.""" + HANDOFF_SYSTEM
+
+WRITER_SYSTEM = """You are a Writing Worker.
+        Your job is to create clear, well-structured content.
+        Synthesize information into readable format.
+        Keep your response focused.
+        Create your written content, using the task and any previous work below.""" + HANDOFF_SYSTEM
+
+# System prompt for each name in WORKERS
+WORKER_SYSTEMS = {
+    "researcher": RESEARCHER_SYSTEM,
+    "coder": CODER_SYSTEM,
+    "writer": WRITER_SYSTEM,
+}
+
+FINALIZER_SYSTEM = """Compile the work from all workers into a final, 
+        cohesive response. Organize it clearly.
+        Each worker's output arrives as its own <chunk> message; the
+        original task comes last. Create the final comprehensive answer."""
+
+CONDENSE_SYSTEM = """Condense this worker output to its essential content.
+        Keep all facts, code and conclusions; drop repetition and filler.
+        Stay under 600 words."""
+
+# Each prompt is defined once, here; nodes only fill in the variables
+# with format_messages, so a prompt's wording lives in one place
+WORKER_PROMPTS = {
+    worker: ChatPromptTemplate.from_messages([
+        ("system", system),
+        ("human", """
+        Task: {task}
         
-        Provide your research findings:
-        """)
-    ]
-    
-    response = llm.invoke(messages)
-    
+        Previous work done: {previous}
+        """),
+    ])
+    for worker, system in WORKER_SYSTEMS.items()
+}
+
+# Worker outputs are passed in as chunk messages (see chunk_message)
+FINALIZER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", FINALIZER_SYSTEM),
+    MessagesPlaceholder("chunks"),
+    ("human", "Original Task: {task}"),
+])
+
+CONDENSE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", CONDENSE_SYSTEM),
+    ("human", "{output}"),
+])
+
+
+# ============================================
+# Worker Definitions
+# ============================================
+
+# Workers the supervisor can call
+WORKERS = ["researcher", "coder", "writer"]
+
+# Route with the LLM instead of WORKERS order (for open-ended tasks
+# where not every worker applies). One LLM call picks the first worker;
+# after that each worker names its successor in its own reply.
+USE_LLM_SUPERVISOR = os.environ.get("USE_LLM_SUPERVISOR") == "1"
+
+encoding = tiktoken.encoding_for_model("gpt-4o")
+
+
+def to_json(data: dict) -> str:
+    """Indented JSON for prompts (orjson when installed: C, no escaping of non-ASCII)"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(data, indent=2)
+
+
+def handoff(state: SupervisorState, worker: str, choice: str) -> str:
+    """Accept a handoff only to a teammate that hasn't run; otherwise finish"""
+    done = set(state.get("worker_results", {})) | {worker}
+    if choice in WORKERS and choice not in done:
+        return choice
+    return "finish"
+
+
+def worker_messages(worker: str, state: dict) -> list:
+    """Prompt for one worker: its static system prompt, then the task and earlier results"""
+    return WORKER_PROMPTS[worker].format_messages(
+        task=state["task"],
+        previous=to_json(state.get("worker_results", {})),
+    )
+
+
+def worker_update(state: dict, worker: str, reply: WorkerReply) -> dict:
+    """State update for one worker's reply"""
     return {
-        "worker_results": {"researcher": response.content},
-        "messages": [AIMessage(content=f"[Researcher]: {response.content}")]
+        "worker_results": {worker: reply.content},
+        "next_worker": handoff(state, worker, reply.next_worker),
+        "messages": [AIMessage(content=f"[{worker.capitalize()}]: {reply.content}")]
     }
 
 
-def coder_worker(state: SupervisorState) -> dict:
-    """Coder Worker: Writes code and technical solutions"""
-    print("  💻 [Coder Worker] Working...")
-    
-    messages = [
-        SystemMessage(content="""You are a Coding Worker.
-        Your job is to write code, technical solutions, or pseudocode.
-        Explain your code clearly.
-        Keep your response focused."""),
-        HumanMessage(content=f"""
-        Task: {state['task']}
-        
-        Previous work done: {json.dumps(state.get('worker_results', {}), indent=2)}
-        
-        Provide your technical solution:
-        """)
-    ]
+async def researcher_worker(state: SupervisorState) -> dict:
+    """Research Worker: Finds information and facts"""
+    log.info("  🔍 [Researcher Worker] Working...")
     
-    response = llm.invoke(messages)
+    reply = await worker_llm.ainvoke(worker_messages("researcher", state))
+    return worker_update(state, "researcher", reply)
+
+
+async def coder_worker(state: SupervisorState) -> dict:
+    """Coder Worker: Writes code and technical solutions"""
+    log.info("  💻 [Coder Worker] Working...")
     
-    return {
-        "worker_results": {"coder": response.content},
-        "messages": [AIMessage(content=f"[Coder]: {response.content}")]
-    }
+    reply = await worker_llm.ainvoke(worker_messages("coder", state))
+    return worker_update(state, "coder", reply)
 
 
-def writer_worker(state: SupervisorState) -> dict:
+async def writer_worker(state: SupervisorState) -> dict:
     """Writer Worker: Creates polished content"""
-    print("  ✍️ [Writer Worker] Working...")
+    log.info("  ✍️ [Writer Worker] Working...")
     
-    messages = [
-        SystemMessage(content="""You are a Writing Worker.
-        Your job is to create clear, well-structured content.
-        Synthesize information into readable format.
-        Keep your response focused."""),
-        HumanMessage(content=f"""
-        Task: {state['task']}
-        
-        Previous work done: {json.dumps(state.get('worker_results', {}), indent=2)}
-        
-        Create your written content:
-        """)
-    ]
+    reply = await worker_llm.ainvoke(worker_messages("writer", state))
+    return worker_update(state, "writer", reply)
+
+
+async def scatter_workers(state: dict, workers: list[str]) -> dict:
+    """Run every one of `workers` that hasn't run yet, as one abatch"""
+    done = state.get("worker_results", {})
+    remaining = [worker for worker in workers if worker not in done]
+    log.info("  🚀 [Scatter] Running in parallel: %s", ", ".join(remaining))
     
-    response = llm.invoke(messages)
+    replies = await worker_llm.abatch(
+        [worker_messages(worker, state) for worker in remaining],
+        config={"max_concurrency": 8},
+    )
+    results = [worker_update(state, worker, reply) for worker, reply in zip(remaining, replies)]
     
-    return {
-        "worker_results": {"writer": response.content},
-        "messages": [AIMessage(content=f"[Writer]: {response.content}")]
-    }
+    update = {"worker_results": {}, "messages": []}
+    for result in results:
+        update["worker_results"].update(result["worker_results"])
+        update["messages"].extend(result["messages"])
+    return update
 
 
 # ============================================
-# Supervisor Node
+# Team Leads (sub-supervisors)
 # ============================================
+# The top supervisor dispatches to team leads in parallel; each lead is
+# its own compiled graph that scatters its workers. Adding a team adds
+# a parallel branch, not another serial supervisor hop.
+
+TEAMS = {
+    "research_lead": ["researcher"],
+    "delivery_lead": ["coder", "writer"],
+}
+
+
+class TeamState(TypedDict):
+    task: str
+    messages: Annotated[list, operator.add]
+    worker_results: Annotated[dict, merge_in_place]
+
+
+def build_team(workers: list[str]):
+    """Compiled subgraph that runs `workers` concurrently"""
+    async def scatter(state: TeamState) -> dict:
+        return await scatter_workers(state, workers)
+    
+    team_builder = StateGraph(TeamState)
+    team_builder.add_node("scatter", scatter)
+    team_builder.add_edge(START, "scatter")
+    team_builder.add_edge("scatter", END)
+    return team_builder.compile()
 
-def supervisor_node(state: SupervisorState) -> dict:
+
+def make_lead(name: str, workers: list[str]):
     """
-    Supervisor: Decides which worker to call next or finish
+    Lead node for the top graph. The team starts from the task alone and
+    only its new results bubble up - returning the subgraph's whole
+    state would append the parent's messages a second time.
     """
-    print("\n👔 [Supervisor] Evaluating...")
+    team = build_team(workers)
     
-    # Check iteration limit
-    current_iteration = state.get("iteration", 0)
-    if current_iteration >= 5:
-        print("  ⚠️ Maximum iterations reached. Finishing.")
+    async def lead(state: SupervisorState) -> dict:
+        log.info("  🧑‍💼 [%s] Dispatching: %s", name, ", ".join(workers))
+        result = await team.ainvoke({
+            "task": state["task"],
+            "messages": [],
+            "worker_results": {},
+        })
         return {
-            "next_worker": "FINISH",
-            "iteration": current_iteration + 1
+            "worker_results": result["worker_results"],
+            "messages": result["messages"],
         }
     
-    # Build the supervisor prompt
-    supervisor_prompt = f"""You are a Supervisor managing a team of workers.
+    return lead
+
+
+# ============================================
+# Supervisor Node
+# ============================================
+
+# Static routing instructions stay in the system message so every call
+# starts with the same cacheable prefix; only the task varies.
+# Only used when USE_LLM_SUPERVISOR is set.
+SUPERVISOR_SYSTEM = """You are a Supervisor managing a team of workers.
 
 Available workers:
 - researcher: Finds information, facts, and data
 - coder: Writes code and technical solutions
 - writer: Creates polished, well-written content
 
-Current Task: {state['task']}
+No work has been done yet. Set next to the worker who should start on
+the task; the workers hand off to each other from there.
+"""
 
-Work completed so far:
-{json.dumps(state.get('worker_results', {}), indent=2)}
+SUPERVISOR_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SUPERVISOR_SYSTEM),
+    ("human", "Current Task: {task}"),
+])
 
-Based on the task and work done:
-1. If the task is COMPLETE, respond with: FINISH
-2. If more work is needed, respond with the name of the next worker to use
 
-IMPORTANT: Respond with ONLY one word - either a worker name (researcher, coder, writer) or FINISH.
-"""
+async def ask_llm_supervisor(state: SupervisorState) -> str:
+    """Let the LLM pick the first worker (only used with USE_LLM_SUPERVISOR)"""
+    messages = SUPERVISOR_PROMPT.format_messages(task=state["task"])
     
-    messages = [
-        SystemMessage(content="You are a task supervisor. Respond with only one word."),
-        HumanMessage(content=supervisor_prompt)
-    ]
+    # The schema only admits a worker name, so there is no free text to
+    # parse and no fallback for an unclear reply
+    decision = await structured_router.ainvoke(messages)
+    return decision.next
+
+
+async def supervisor_node(state: SupervisorState) -> dict:
+    """
+    Supervisor: Decides which worker to call next or finish
     
-    response = llm.invoke(messages)
-    next_action = response.content.strip().lower()
+    By default this is plain Python: every team lead is dispatched at
+    once, then finish. No LLM call is needed to pick the next step.
     
-    # Validate response
-    if next_action not in WORKERS and next_action != "finish":
-        # Default to FINISH if response is unclear
-        next_action = "finish"
+    With USE_LLM_SUPERVISOR, the LLM only triages: it picks the first
+    worker, and from there workers hand off to each other.
+    """
+    log.info("👔 [Supervisor] Evaluating...")
     
-    print(f"  📋 Decision: {next_action.upper()}")
+    if USE_LLM_SUPERVISOR:
+        next_action = await ask_llm_supervisor(state)
+    else:
+        done = state.get("worker_results", {})
+        remaining = [worker for worker in WORKERS if worker not in done]
+        next_action = "scatter" if remaining else "finish"
     
-    return {
-        "next_worker": next_action.lower(),
-        "iteration": current_iteration + 1,
-        "messages": [AIMessage(content=f"[Supervisor]: Next action -> {next_action}")]
-    }
+    log.info("  📋 Decision: %s", next_action.upper())
+    
+    return {"next_worker": next_action}
 
 
 # ============================================
-# Routing Function
+# Routing Functions
 # ============================================
 
-def route_supervisor(state: SupervisorState) -> Literal["researcher", "coder", "writer", "finish"]:
-    """Route based on supervisor's decision"""
-    next_worker = state.get("next_worker", "").lower()
-    
-    if next_worker == "researcher":
-        return "researcher"
-    elif next_worker == "coder":
-        return "coder"
-    elif next_worker == "writer":
-        return "writer"
-    else:
-        return "finish"
+# Decisions that fan out to several nodes; anything else is a node name
+FAN_OUT = {"scatter": list(TEAMS)}
+
+
+def route_supervisor(state: SupervisorState) -> list[str] | str:
+    """Route based on supervisor's decision (a scatter fans out to every lead)"""
+    return FAN_OUT.get(state["next_worker"], state["next_worker"])
+
+
+def route_handoff(state: SupervisorState) -> Literal["researcher", "coder", "writer", "finish"]:
+    """Route to the teammate the last worker handed off to"""
+    next_worker = state.get("next_worker", "finish")
+    log.info("  🤝 Handoff: %s", next_worker)
+    return next_worker
 
 
 # ============================================
 # Final Answer Node
 # ============================================
 
-def compile_final_answer(state: SupervisorState) -> dict:
-    """Compile all worker results into final answer"""
-    print("\n📝 [Finalizer] Compiling final answer...")
+# Token budget per worker output in the finalizer prompt, so its size
+# (and latency/cost) is bounded however verbose the workers are
+MAX_WORKER_TOKENS = 800
+
+# With only one worker's output there is nothing to compile: return it
+# as is instead of paying an LLM round-trip to reformat it
+SKIP_FINALIZER_IF_SINGLE = True
+
+
+async def condense(output: str) -> str:
+    """
+    Fit one worker output into MAX_WORKER_TOKENS.
     
-    messages = [
-        SystemMessage(content="""Compile the work from all workers into a final, 
-        cohesive response. Organize it clearly."""),
-        HumanMessage(content=f"""
-        Original Task: {state['task']}
-        
-        Worker Outputs:
-        {json.dumps(state.get('worker_results', {}), indent=2)}
-        
-        Create the final comprehensive answer:
-        """)
-    ]
+    Slightly long outputs are cut off; outputs over 4x the budget would
+    lose too much that way, so they are summarized by the small model
+    first. The summary call goes through CachedLLM, so it is paid once
+    per distinct output.
+    """
+    tokens = encoding.encode(output)
+    if len(tokens) <= MAX_WORKER_TOKENS:
+        return output
     
-    response = llm.invoke(messages)
+    if len(tokens) > 4 * MAX_WORKER_TOKENS:
+        response = await small_llm.ainvoke(CONDENSE_PROMPT.format_messages(output=output))
+        tokens = encoding.encode(response.content)
     
-    return {"final_answer": response.content}
+    return encoding.decode(tokens[:MAX_WORKER_TOKENS])
+
+
+def chunk_message(worker: str, output: str) -> HumanMessage:
+    """
+    One worker output as a standalone message. Its text doesn't depend
+    on its position or on the task, so the same output always renders
+    byte-identical.
+    """
+    return HumanMessage(content=f'<chunk worker="{worker}">\n{output}\n</chunk>')
+
+
+async def compile_final_answer(state: SupervisorState, config: RunnableConfig) -> dict:
+    """
+    Compile all worker results into final answer
+    
+    The answer is streamed to stdout unless the run's config sets
+    stream_answer=False (concurrent runs would interleave their text).
+    """
+    log.info("📝 [Finalizer] Compiling final answer...")
+    
+    stream_answer = config.get("configurable", {}).get("stream_answer", True)
+    
+    # Parallel leads finish in any order; keep the prompt in WORKERS order
+    done = state.get("worker_results", {})
+    worker_results = {worker: done[worker] for worker in WORKERS if worker in done}
+    
+    if stream_answer:
+        print("\n" + "="*70)
+        print("✅ FINAL ANSWER:")
+        print("="*70)
+    
+    if SKIP_FINALIZER_IF_SINGLE and len(worker_results) == 1:
+        only = next(iter(worker_results.values()))
+        if stream_answer:
+            print(only)
+        return {"final_answer": only}
+    
+    outputs = await asyncio.gather(*(condense(output) for output in worker_results.values()))
+    
+    # Static system prompt, then one chunk per worker in WORKERS order,
+    # then the task - the only part that changes between tasks. Plain
+    # text, not JSON: no escaped quotes inside the coder's code blocks.
+    messages = FINALIZER_PROMPT.format_messages(
+        chunks=[chunk_message(worker, output) for worker, output in zip(worker_results, outputs)],
+        task=state["task"],
+    )
+    
+    if not stream_answer:
+        response = await llm.ainvoke(messages)
+        return {"final_answer": response.content}
+    
+    # Stream the answer to the terminal as it is generated: the user
+    # sees the first words at first-token latency, not after the last
+    parts = []
+    async with aclosing(llm.astream(messages)) as stream:
+        async for chunk in stream:
+            parts.append(chunk.content)
+            sys.stdout.write(chunk.content)
+            sys.stdout.flush()
+    print()
+    
+    return {"final_answer": "".join(parts)}
 
 
 # ============================================
 # Build the Supervisor-Worker Graph
 # ============================================
 
-print("""
+def _print_banner():
+    """Graph diagram, printed at start-up with VERBOSE=1 (never on import)"""
+    print("""
 ┌─────────────────────────────────────────────────────────────────┐
 │                 SUPERVISOR-WORKER PATTERN                        │
 ├─────────────────────────────────────────────────────────────────┤
 │                                                                  │
 │                      ┌────────────────┐                         │
-│                      │   SUPERVISOR   │◀─────────────┐          │
-│                      │     👔         │              │          │
-│                      └───────┬────────┘              │          │
-│                              │                       │          │
-│              ┌───────────────┼───────────────┐       │          │
-│              │               │               │       │          │
-│              ▼               ▼               ▼       │          │
-│       ┌──────────┐    ┌──────────┐    ┌──────────┐  │          │
-│       │RESEARCHER│    │  CODER   │    │  WRITER  │──┘          │
+│                      │   SUPERVISOR   │ (triage once)           │
+│                      │     👔         │                         │
+│                      └───────┬────────┘                         │
+│                              │                                   │
+│             ┌────────────────┴───────────────┐  (in parallel)   │
+│             ▼                                ▼                  │
+│     ┌───────────────┐              ┌─────────────────┐          │
+│     │ RESEARCH LEAD │              │  DELIVERY LEAD  │          │
+│     │      🧑‍💼      │              │       🧑‍💼       │          │
+│     └───────┬───────┘              └────────┬────────┘          │
+│             ▼                        ┌──────┴──────┐            │
+│       ┌──────────┐ 🤝 ┌──────────┐ 🤝 ┌──────────┐             │
+│       │RESEARCHER│◀──▶│  CODER   │◀──▶│  WRITER  │             │
 │       │    🔍    │    │    💻    │    │    ✍️    │             │
 │       └──────────┘    └──────────┘    └──────────┘             │
-│                                                                  │
-│                              │                                   │
+│              │  (LLM mode: peer handoffs 🤝) │                  │
+│              └───────────────┼───────────────┘                  │
 │                              ▼ (When FINISH)                     │
 │                      ┌────────────────┐                         │
 │                      │   FINALIZER    │                         │
@@ -269,48 +528,101 @@ print("""
 └─────────────────────────────────────────────────────────────────┘
 """)
 
-# Create the graph
-graph_builder = StateGraph(SupervisorState)
-
-# Add all nodes
-graph_builder.add_node("supervisor", supervisor_node)
-graph_builder.add_node("researcher", researcher_worker)
-graph_builder.add_node("coder", coder_worker)
-graph_builder.add_node("writer", writer_worker)
-graph_builder.add_node("finish", compile_final_answer)
-
-# Start with supervisor
-graph_builder.add_edge(START, "supervisor")
-
-# Supervisor routes to workers or finish
-graph_builder.add_conditional_edges(
-    "supervisor",
-    route_supervisor,
-    {
-        "researcher": "researcher",
-        "coder": "coder",
-        "writer": "writer",
-        "finish": "finish"
-    }
-)
-
-# All workers go back to supervisor
-graph_builder.add_edge("researcher", "supervisor")
-graph_builder.add_edge("coder", "supervisor")
-graph_builder.add_edge("writer", "supervisor")
 
-# Finish goes to END
-graph_builder.add_edge("finish", END)
-
-# Compile
-graph = graph_builder.compile()
+@functools.cache
+def build_graph():
+    """
+    Build and compile the graph once per process, on first use - not as
+    a side effect of importing this module.
+    """
+    # Create the graph
+    graph_builder = StateGraph(SupervisorState)
+    
+    # Add all nodes
+    graph_builder.add_node("supervisor", supervisor_node)
+    graph_builder.add_node("researcher", researcher_worker)
+    graph_builder.add_node("coder", coder_worker)
+    graph_builder.add_node("writer", writer_worker)
+    for lead, team in TEAMS.items():
+        graph_builder.add_node(lead, make_lead(lead, team))
+    graph_builder.add_node("finish", compile_final_answer)
+    
+    # Start with supervisor
+    graph_builder.add_edge(START, "supervisor")
+    
+    # Supervisor routes to a worker, all team leads at once, or finish
+    graph_builder.add_conditional_edges(
+        "supervisor",
+        route_supervisor,
+        {
+            "researcher": "researcher",
+            "coder": "coder",
+            "writer": "writer",
+            "research_lead": "research_lead",
+            "delivery_lead": "delivery_lead",
+            "finish": "finish"
+        }
+    )
+    
+    # Workers hand off directly to the next worker (or finish)
+    for worker in WORKERS:
+        graph_builder.add_conditional_edges(
+            worker,
+            route_handoff,
+            {
+                "researcher": "researcher",
+                "coder": "coder",
+                "writer": "writer",
+                "finish": "finish"
+            }
+        )
+    
+    # Leads run in parallel; finish waits for all of them
+    for lead in TEAMS:
+        graph_builder.add_edge(lead, "finish")
+    
+    # Finish goes to END
+    graph_builder.add_edge("finish", END)
+    
+    # Compile
+    return graph_builder.compile()
 
 
 # ============================================
 # Run the Supervisor-Worker System
 # ============================================
 
-if __name__ == "__main__":
+def new_state(task: str) -> SupervisorState:
+    """Initial graph state for one task"""
+    return {
+        "task": task,
+        "messages": [],
+        "next_worker": "",
+        "worker_results": {},
+        "final_answer": ""
+    }
+
+
+async def process_batch(tasks: list[str], concurrency: int = 8) -> list[dict]:
+    """
+    Run many tasks concurrently. Their LLM calls overlap, so a batch
+    takes about as long as its slowest task; the semaphore caps how
+    many run at once (provider rate limits).
+    
+    A single task streams its answer; in a batch the answers would
+    interleave, so they are returned for the caller to print.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    config = {"configurable": {"stream_answer": len(tasks) == 1}}
+    
+    async def bounded(task: str) -> dict:
+        async with semaphore:
+            return await build_graph().ainvoke(new_state(task), config=config)
+    
+    return await asyncio.gather(*(bounded(task) for task in tasks))
+
+
+async def main():
     # Test tasks
     tasks = [
         "Create a Python function that calculates compound interest and explain how it works",
@@ -321,23 +633,28 @@ if __name__ == "__main__":
         print("\n" + "="*70)
         print(f"📋 TASK: {task}")
         print("="*70)
-        
-        initial_state: SupervisorState = {
-            "task": task,
-            "messages": [],
-            "next_worker": "",
-            "worker_results": {},
-            "final_answer": "",
-            "iteration": 0
-        }
-        
-        result = graph.invoke(initial_state)
-        
-        print("\n" + "="*70)
-        print("✅ FINAL ANSWER:")
-        print("="*70)
-        print(result["final_answer"])
+    
+    results = await process_batch(tasks)
+    
+    for task, result in zip(tasks, results):
+        if len(tasks) > 1:
+            print("\n" + "="*70)
+            print(f"✅ FINAL ANSWER: {task}")
+            print("="*70)
+            print(result["final_answer"])
         
         print("\n📊 Workers Used:")
         for worker, output in result["worker_results"].items():
-            print(f"  - {worker}: {len(output)} characters of output")
\ No newline at end of file
+            print(f"  - {worker}: {len(output)} characters of output")
+    
+    hits = llm.hits + small_llm.hits
+    misses = llm.misses + small_llm.misses
+    print(f"\n💾 LLM cache: {hits} hits, {misses} misses")
+
+
+if __name__ == "__main__":
+    # Milliseconds since start-up, so overlapping nodes can be told apart
+    set_log_format("%(relativeCreated)7.0fms %(message)s")
+    if os.environ.get("VERBOSE"):
+        _print_banner()
+    asyncio.run(main())
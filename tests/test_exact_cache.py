@@ -0,0 +1,94 @@
+"""
+CachedLLM keys: model, structured output, batches and streams.
+
+Run with: python -m unittest discover tests
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+from contextlib import aclosing
+from unittest import mock
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel
+
+from semantic_cache import CachedLLM
+
+
+class Answer(BaseModel):
+    text: str
+
+
+class FakeChatModel(FakeListChatModel):
+    """FakeListChatModel with the settings CachedLLM keys on"""
+    model_name: str = "fake-small"
+    temperature: float = 0.0
+
+    def with_structured_output(self, schema, **kwargs):
+        return RunnableLambda(lambda _: schema(text="structured"))
+
+
+class ExactCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.db")
+        self.opened: list[CachedLLM] = []
+        self.model = FakeChatModel(responses=["first", "second", "third"])
+        self.llm = self.cached(self.model)
+
+    def tearDown(self):
+        for llm in self.opened:
+            llm._db.close()
+        self.tmp.cleanup()
+
+    def cached(self, model) -> CachedLLM:
+        llm = CachedLLM(model, path=self.path)
+        self.opened.append(llm)
+        return llm
+
+    def test_same_prompt_hits(self):
+        self.assertEqual(self.llm.invoke("hello").content, "first")
+        self.assertEqual(self.llm.invoke("hello").content, "first")
+        self.assertEqual(self.model.i, 1)
+
+    def test_other_model_does_not_hit(self):
+        self.assertEqual(self.llm.invoke("hello").content, "first")
+        other = self.cached(FakeChatModel(responses=["large"], model_name="fake-large"))
+        self.assertEqual(other.invoke("hello").content, "large")
+
+    def test_other_temperature_does_not_hit(self):
+        self.assertEqual(self.llm.invoke("hello").content, "first")
+        other = self.cached(FakeChatModel(responses=["warm"], temperature=0.7))
+        self.assertEqual(other.invoke("hello").content, "warm")
+
+    def test_structured_output_is_keyed_apart_from_text(self):
+        self.assertEqual(self.llm.invoke("hello").content, "first")
+        self.assertEqual(self.llm.with_structured_output(Answer).invoke("hello").text, "structured")
+        self.assertEqual(self.llm.invoke("hello").content, "first")
+        self.assertEqual(self.model.i, 1)
+
+    def test_abatch_keeps_order_and_stores_only_misses(self):
+        self.assertEqual(self.llm.invoke("b").content, "first")
+
+        with mock.patch.object(self.llm, "_put", wraps=self.llm._put) as put:
+            responses = asyncio.run(self.llm.abatch(["a", "b", "c"], {"max_concurrency": 1}))
+
+        self.assertEqual([r.content for r in responses], ["second", "first", "third"])
+        self.assertEqual(put.call_count, 2)
+
+    def test_stream_closed_early_is_not_cached(self):
+        async def first_chunk():
+            async with aclosing(self.llm.astream("hello")) as stream:
+                async for chunk in stream:
+                    return chunk.content
+
+        self.assertEqual(asyncio.run(first_chunk()), "f")
+        self.assertEqual(self.llm.invoke("hello").content, "second")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Similarity kernels against a plain NumPy reference, with and without Numba.
+
+Run with: python -m unittest discover tests
+"""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from semantic_cache import _kernels
+from semantic_cache._kernels import _topk_numpy, quantize_int8, topk_cosine, topk_cosine_int8
+
+
+def unit(rows: np.ndarray) -> np.ndarray:
+    return (rows / np.linalg.norm(rows, axis=-1, keepdims=True)).astype(np.float32)
+
+
+class KernelTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.matrix = unit(rng.standard_normal((2000, 384)))
+        # Well separated best matches: rows 7, 42, 1000 in that order
+        self.query = unit(3 * self.matrix[7] + 2 * self.matrix[42] + self.matrix[1000])
+        # Run every test on the Numba kernels and on the NumPy fallback
+        self.paths = {"numba": _kernels.njit, "numpy": None}
+
+    def run_paths(self, test):
+        for name, njit in self.paths.items():
+            if name == "numba" and njit is None:
+                continue
+            with self.subTest(path=name), mock.patch.object(_kernels, "njit", njit):
+                test()
+
+    def test_topk_cosine_matches_numpy(self):
+        def test():
+            top, scores = topk_cosine(self.matrix, self.query, 5)
+            expected_top, expected_scores = _topk_numpy(self.matrix @ self.query, 5)
+            np.testing.assert_array_equal(top, expected_top)
+            np.testing.assert_allclose(scores, expected_scores, atol=1e-5)
+        self.run_paths(test)
+
+    def test_int8_topk_matches_float32(self):
+        codes, scales = quantize_int8(self.matrix)
+
+        def test():
+            top, scores = topk_cosine_int8(codes, scales, self.query, 3)
+            np.testing.assert_array_equal(top, [7, 42, 1000])
+            np.testing.assert_allclose(scores, self.matrix[top] @ self.query, atol=0.01)
+        self.run_paths(test)
+
+    def test_k_larger_than_n_returns_every_row(self):
+        matrix = self.matrix[:3]
+        codes, scales = quantize_int8(matrix)
+        expected_top, _ = _topk_numpy(matrix @ self.query, 3)
+
+        def test():
+            top, scores = topk_cosine(matrix, self.query, 10)
+            np.testing.assert_array_equal(top, expected_top)
+            top, scores = topk_cosine_int8(codes, scales, self.query, 10)
+            np.testing.assert_array_equal(top, expected_top)
+            self.assertEqual(len(topk_cosine(matrix[:0], self.query, 10)[0]), 0)
+        self.run_paths(test)
+
+    def test_all_zero_rows_score_zero(self):
+        matrix = np.zeros((4, 384), dtype=np.float32)
+        matrix[2] = self.query
+        codes, scales = quantize_int8(matrix)
+
+        def test():
+            for top, scores in (topk_cosine(matrix, self.query, 4),
+                                topk_cosine_int8(codes, scales, self.query, 4)):
+                self.assertEqual(top[0], 2)
+                np.testing.assert_allclose(scores[1:], 0.0)
+
+            zero = np.zeros(384, dtype=np.float32)
+            _, scores = topk_cosine_int8(codes, scales, zero, 4)
+            np.testing.assert_allclose(scores, 0.0)
+        self.run_paths(test)
+
+
+if __name__ == "__main__":
+    unittest.main()
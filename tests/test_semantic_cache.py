@@ -0,0 +1,120 @@
+"""
+CachedChatOpenAI must only match requests, never shared instructions.
+
+Run with: python -m unittest discover tests
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import unittest
+from contextlib import aclosing
+
+import numpy as np
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from semantic_cache import CachedChatOpenAI
+
+
+class BagOfWordsEmbeddings:
+    """Stand-in embedder: word counts hashed into a fixed-size vector"""
+
+    def embed_query(self, text: str) -> list[float]:
+        vector = np.zeros(256, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 256] += 1
+        return vector.tolist()
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return self.embed_query(text)
+
+
+# Long enough to dominate a whole-prompt embedding
+SYSTEM = "You are a Billing Support Specialist. " + " ".join(
+    f"Policy {i}: always be polite, clear and helpful to the customer." for i in range(30)
+)
+
+
+class SemanticCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model = FakeListChatModel(responses=["first", "second", "third"])
+        self.llm = CachedChatOpenAI(
+            self.model,
+            embeddings=BagOfWordsEmbeddings(),
+            path=os.path.join(self.tmp.name, "cache.db"),
+        )
+
+    def tearDown(self):
+        self.llm._db.close()
+        self.tmp.cleanup()
+
+    def ask(self, system: str, message: str) -> str:
+        return self.llm.invoke(
+            [SystemMessage(content=system), HumanMessage(content=message)], tag="billing"
+        ).content
+
+    def test_different_messages_under_one_system_prompt_do_not_hit(self):
+        self.assertEqual(self.ask(SYSTEM, "I was charged twice for my subscription"), "first")
+        self.assertEqual(self.ask(SYSTEM, "Please send me the invoice for March"), "second")
+
+    def test_same_message_hits(self):
+        self.assertEqual(self.ask(SYSTEM, "I was charged twice for my subscription"), "first")
+        self.assertEqual(self.ask(SYSTEM, "I was charged twice for my subscription"), "first")
+        self.assertEqual(self.model.i, 1)
+
+    def test_same_message_under_other_instructions_does_not_hit(self):
+        self.assertEqual(self.ask(SYSTEM, "I was charged twice for my subscription"), "first")
+        self.assertEqual(self.ask("You are a Technical Support Specialist.",
+                                  "I was charged twice for my subscription"), "second")
+
+    def test_stream_closed_early_is_not_cached(self):
+        async def first_chunk():
+            prompt = [SystemMessage(content=SYSTEM), HumanMessage(content="I was charged twice")]
+            async with aclosing(self.llm.astream(prompt, tag="billing")) as stream:
+                async for chunk in stream:
+                    return chunk.content
+        
+        self.assertEqual(asyncio.run(first_chunk()), "f")
+        self.assertEqual(self.ask(SYSTEM, "I was charged twice"), "second")
+
+
+class ExactOnlyTagTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model = FakeListChatModel(responses=["first", "second"])
+        self.llm = CachedChatOpenAI(
+            self.model,
+            embeddings=BagOfWordsEmbeddings(),
+            path=os.path.join(self.tmp.name, "cache.db"),
+            thresholds={"classify": None},
+        )
+
+    def tearDown(self):
+        self.llm._db.close()
+        self.tmp.cleanup()
+
+    def classify(self, tickets: list[str]) -> str:
+        numbered = "\n".join(f'{i}. "{ticket}"' for i, ticket in enumerate(tickets, 1))
+        return self.llm.invoke(
+            [SystemMessage(content=SYSTEM), HumanMessage(content=numbered)], tag="classify"
+        ).content
+
+    def test_reordered_batch_does_not_hit(self):
+        a, b = "I was charged twice for my subscription", "Please send me the invoice for March"
+        self.assertEqual(self.classify([a, b]), "first")
+        self.assertEqual(self.classify([b, a]), "second")
+
+    def test_identical_batch_hits(self):
+        tickets = ["I was charged twice for my subscription"]
+        self.assertEqual(self.classify(tickets), "first")
+        self.assertEqual(self.classify(tickets), "first")
+        self.assertEqual(self.model.i, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()